@@ -205,7 +205,7 @@ class BIDSid(object):
         """
         return self.__run
 
-    def GetPrefix(self, run=None, app=""):
+    def GetPrefix(self, run=None, app="", acq=None):
         """
         provides bids-formatted prefix from the dataset id:
         sub-<sunbId>_task-<taskId>[_ses-<sesid>][_run-<runId>]
@@ -217,6 +217,9 @@ class BIDSid(object):
             the id of the run, if not set, recording-defined is used
         appendix: str
             appendix for prefix, for example file extention
+        acq: str, optional
+            suffix appended to acquisition label, used to distinguish
+            files of the same run, for example by sampling frequency
 
         Returns
         -------
@@ -237,10 +240,15 @@ class BIDSid(object):
             run = self.__run
         if not isinstance(app, str):
             raise TypeError("app must be a string")
+        prefix = self.__prefix
+        if acq is not None:
+            if not isinstance(acq, str):
+                raise TypeError("acq must be a string")
+            prefix = self.__makePrefix(self.__acquisition + acq)
         if run is None:
-            return self.__prefix + app
+            return prefix + app
         else: 
-            return self.__prefix + "_run-" + str(run) + app
+            return prefix + "_run-" + str(run) + app
 
     def ResetPrefix(self):
         """
@@ -257,7 +265,6 @@ class BIDSid(object):
         ValueError
             if record is locked
         """
-        path = ""
         if self.__locked:
             raise ValueError("record IDs is locked")
         sub = ""
@@ -267,17 +274,24 @@ class BIDSid(object):
         if self.__session != "": 
             ses = "ses-" + self.__session 
         self.__innerPath = os.path.join(sub, ses) + "/"
+        self.__prefix = self.__makePrefix(self.__acquisition)
 
-        prefix = sub
+        return self.__prefix
+
+    def __makePrefix(self, acquisition):
+        """
+        builds bids-formatted prefix with given acquisition label
+        """
+        prefix = ""
+        if self.__subject != "":
+            prefix = "sub-" + self.__subject
         if self.__session != "":
-            prefix += "_" + ses
+            prefix += "_ses-" + self.__session
         if self.__task != "":
             prefix += "_task-" + self.__task
-        if self.__acquisition != "": 
-            prefix = prefix + "_acq-" + self.__acquisition 
-        self.__prefix = prefix
-
-        return self.__prefix
+        if acquisition != "": 
+            prefix = prefix + "_acq-" + acquisition 
+        return prefix
 
     def GetInnerPath(self):
         """
@@ -55,6 +55,15 @@ class BrainVision(object):
     def GetDataFormat(self):
         return self.Header.BinaryInfo.BinaryFormat
 
+    def SetOrientation(self, orientation):
+        orients = ["MULTIPLEXED", "VECTORIZED"]
+        if orientation not in orients:
+            raise Exception("BrainVision: data orientation {} is not supported".format(orientation))
+        self.Header.CommonInfo.DataOrientation = orientation
+
+    def GetOrientation(self):
+        return self.Header.CommonInfo.DataOrientation
+
     def AddFrequency(self, freq):
         if type(freq) != int:
             raise Exception(__name__+": Only integer frequency is supported")
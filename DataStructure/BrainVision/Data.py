@@ -22,50 +22,123 @@
 ## along with eegBidsCreator.  If not, see <https://www.gnu.org/licenses/>.
 ############################################################################
 
-import struct
+import numpy
 
 class DataFile(object):
-    __slots__ = ["__marker", "__endian", "__file", "__prefix", "__path"]
+    __slots__ = ["__dtype", "__file", "__prefix", "__path",
+                 "__orientation", "__points", "__channels", "__position"]
+
+    """ Numpy types corresponding to BrainVision binary formats"""
+    _Formats = {"INT_16": "i2", "UINT_16": "u2", "IEEE_FLOAT_32": "f4"}
 
     def __init__(self, path, prefix):
-        self.__marker = 'f'
-        self.__endian = '<'
+        self.__dtype  = numpy.dtype('<f4')
         self.__file   = None
         self.__prefix = prefix
         self.__path   = path
+        self.__orientation = "MULTIPLEXED"
+        self.__points   = 0
+        self.__channels = 0
+        self.__position = 0
 
     def SetDataFormat(self, dformat):
-        if dformat == "INT_16":
-            self.__marker = 'h'
-        elif dformat == "UINT_16":
-            self.__marker = 'H'
-        elif dformat == "IEEE_FLOAT_32":
-            self.__marker = 'f'
-        else:
+        if dformat not in self._Formats:
             raise Exception("BrainVision: Data format {} is not supported".format(dformat))
+        self.__dtype = numpy.dtype(self.__dtype.byteorder 
+                                   + self._Formats[dformat])
 
     def SetEndian(self, endian):
         if endian == "NO":
-            self.__endian = '<'
+            self.__dtype = self.__dtype.newbyteorder('<')
         elif endian == "YES":
-            self.__endian = '>'
+            self.__dtype = self.__dtype.newbyteorder('>')
         else:
             raise Exception("BrainVision: Undefined value {}".format(endian))
 
-    def OpenFile(self):
+    def GetDtype(self):
+        return self.__dtype
+
+    def SetOrientation(self, orientation, points=0):
+        """
+        Sets data orientation. In VECTORIZED orientation,
+        all points of a channel are written before the next channel,
+        so the total number of points must be known in advance
+
+        Parameters
+        ----------
+        orientation : str
+            either MULTIPLEXED or VECTORIZED
+        points : int
+            number of data points per channel
+        """
+        if orientation not in ["MULTIPLEXED", "VECTORIZED"]:
+            raise Exception("BrainVision: Data orientation {} is not supported".format(orientation))
+        self.__orientation = orientation
+        self.__points = points
+
+    def OpenFile(self, channels=0):
+        """
+        Opens data file. In VECTORIZED orientation, the file is 
+        preallocated for given number of channels
+
+        Parameters
+        ----------
+        channels : int
+            number of channels
+        """
         self.__file = open (self.__path+"/"+self.__prefix+"_eeg.eeg", "bw")
+        self.__channels = channels
+        self.__position = 0
+        if self.__orientation == "VECTORIZED":
+            self.__file.truncate(self.__channels * self.__points 
+                                 * self.__dtype.itemsize)
         
     def WriteBlock(self, data):
-        if type(data) != list or type(data[0]) != list:
-            raise Exception("BrainVision: Must have nested list [channels][points]")
+        """
+        Writes a block of data, following the previous block.
+        In MULTIPLEXED orientation, data are converted to the file 
+        format and written at once. In VECTORIZED orientation, each
+        channel is converted and written at its offset in file.
+
+        Parameters
+        ----------
+        data : list(array_like)
+            list of data, one per channel, all of the same length
+        """
+        if type(data) != list or len(data) == 0:
+            raise Exception("BrainVision: Must have list of channels data [channels][points]")
         for c in data:
             if len(c) != len(data[0]):
                 raise Exception("BrainVision: All points list must have same lenght")
 
-        for j in range(0, len(data[0])):
-            d = [0]*len(data)
-            for k in range(0, len(data)):
-                d[k] = data[k][j]
-            self.__file.write(struct.pack(self.__endian+self.__marker*len(data),*d))
-
+        if self.__orientation == "VECTORIZED":
+            if len(data) != self.__channels:
+                raise Exception("BrainVision: Expected {} channels, got {}"
+                                .format(self.__channels, len(data)))
+            if self.__position + len(data[0]) > self.__points:
+                raise Exception("BrainVision: Data exceeds declared {} points"
+                                .format(self.__points))
+            for k, c in enumerate(data):
+                self.__file.seek((k * self.__points + self.__position)
+                                 * self.__dtype.itemsize)
+                self.__file.write(self.__convert(c).tobytes())
+        else:
+            # Each column of block is one channel, rows are in multiplexed order
+            block = numpy.empty((len(data[0]), len(data)), dtype=self.__dtype)
+            for k, c in enumerate(data):
+                block[:, k] = self.__convert(c)
+            self.__file.write(block.tobytes())
+        self.__position += len(data[0])
 
+    def __convert(self, data):
+        """
+        Converts data to file format, checking the range for 
+        integer formats
+        """
+        data = numpy.asarray(data)
+        if self.__dtype.kind in "iu" and data.size > 0:
+            info = numpy.iinfo(self.__dtype)
+            if data.min() < info.min or data.max() > info.max:
+                raise Exception("BrainVision: values out of range [{}, {}]"
+                                .format(info.min, info.max))
+        return data.astype(self.__dtype, copy=False)
@@ -25,9 +25,11 @@
 
 
 from datetime import datetime
+from datetime import timedelta
+import bisect
 
 class MarkerFile(object):
-    __slots__ = ["DataFile", "__file", "__path", "__prefix", "__startTime", "__frequency", "__mkCount", "__aDate" ]
+    __slots__ = ["DataFile", "__file", "__path", "__prefix", "__startTime", "__frequency", "__mkCount", "__aDate", "__segments", "__segStarts" ]
 
     def __init__(self, path, prefix, encoding = "ANSII"):
         self.DataFile   = prefix+"_eeg.eeg"
@@ -38,6 +40,8 @@ class MarkerFile(object):
         self.__mkCount  = 0
         self.__file = None
         self.__aDate = None
+        self.__segments = list()
+        self.__segStarts = list()
 
     def SetAnonymDate(self, date):
         self.__aDate = date
@@ -48,6 +52,41 @@ class MarkerFile(object):
     def SetStartTime(self, time):
         self.__startTime = time
 
+    def SetSegments(self, segments):
+        """
+        Declares the segments of stored data. Data of gaps between 
+        segments are not stored, and markers positions are counted 
+        from the start of their segment. Must be called after
+        SetFrequency.
+
+        Parameters
+        ----------
+        segments : list(tuple(datetime, datetime))
+            sorted list of start and end times of segments
+        """
+        self.__segments = list()
+        pos = 0
+        for t_s, t_e in segments:
+            size = (t_e - t_s) // timedelta(microseconds=1)\
+                * self.__frequency // 1000000
+            self.__segments.append((t_s, pos, size))
+            pos += size
+        self.__segStarts = [s[0] for s in self.__segments]
+
+    def __getPosition(self, date):
+        """
+        Returns data point corresponding to date. Dates falling 
+        in a gap are placed at the end of preceeding segment, and
+        dates before the first segment at its start.
+        """
+        if not self.__segments:
+            return int((date - self.__startTime).total_seconds()
+                       * self.__frequency)
+        i = bisect.bisect_right(self.__segStarts, date) - 1
+        t_s, pos, size = self.__segments[max(i, 0)]
+        return pos + max(0, min(int((date - t_s).total_seconds()
+                                    * self.__frequency), size))
+
     def OpenFile(self, encoding):        
         if encoding == "ANSI":
             enc = "ascii"
@@ -73,7 +112,7 @@ class MarkerFile(object):
             raise Exception ("Markers start time or frequency are not initialized")
         self.__mkCount += 1
         #<name>,<description>,<position>,<points>,<channel number>,<date>
-        pos = int((date - self.__startTime).total_seconds()*self.__frequency)
+        pos = self.__getPosition(date)
         lenght = int(duration*self.__frequency + 0.5)
         if self.__aDate != None:
             date = self.__aDate + (date - self.__startTime)
@@ -23,7 +23,8 @@
 ############################################################################
 
 from datetime import datetime, date
-import struct
+
+import numpy
 
 from DataStructure.Generic.Channel import GenChannel
 
@@ -74,10 +75,13 @@ class Channel(GenChannel):
 
 
 class EDF(object):
+    """ Type of data samples in EDF file"""
+    DTYPE = numpy.dtype("<i2")
+
     __slots__ = ["Type", "Patient", "Record", "StartTime", "RecordDuration",
                  "Channels", "Annotations", "Data",
                  "__file", "__path", "__prefix",
-                 "__records", "__aDate", "__EDFplus"]
+                 "__records", "__aDate", "__EDFplus", "__continuous"]
 
     def __init__(self, path, prefix, AnonymDate=None):
         self.__path = path
@@ -94,6 +98,7 @@ class EDF(object):
         self.__records = 0
         self.__aDate = AnonymDate
         self.__EDFplus = False
+        self.__continuous = True
 
     def __del__(self):
         if self.__file is not None:
@@ -110,6 +115,20 @@ class EDF(object):
         """
         self.__EDFplus = value
 
+    def SetContinuous(self, value=True):
+        """
+        sets data to continuous (EDF+C) or discontinuous (EDF+D).
+        In discontinuous data, records are not contiguous in time,
+        their start is given by the time-stamping annotations.
+        Only EDF+ supports discontinuous data.
+
+        Parameters
+        ----------
+        value : bool, True
+            if false, data records can be separated by gaps
+        """
+        self.__continuous = value
+
     def SetStartTime(self, starttime):
         self.StartTime = starttime.replace(microsecond=0)
 
@@ -208,7 +227,7 @@ class EDF(object):
             n_channels = len(self.Channels)+1
         else:
             n_channels = len(self.Channels)
-        self.__writeUpperBlock(self.__file, n_channels)
+        self.__writeUpperBlock(self.__file, n_channels, self.__continuous)
         # [16] Label in format Type Emplacement
         for ch in self.Channels:
             self.__file.write("{:<16s}".format(ch.Label())
@@ -269,7 +288,7 @@ class EDF(object):
         if self.__EDFplus:
             self.__file.write("{:<32s}".format(" ").encode("ascii"))
 
-    def __writeUpperBlock(self, f, n_signal):
+    def __writeUpperBlock(self, f, n_signal, continuous=True):
         # [0-7,8]        Version of data format, always '0'
         f.write("{:<8d}".format(0).encode("ascii"))
         # [8-87, 80]     Local patient identification
@@ -291,7 +310,8 @@ class EDF(object):
         # [192-235,44]   EDF+ identifier
         # ('EDF+C' for continous, 'EDF+D' for discontinious)
         if self.__EDFplus:
-            f.write("{:<44s}".format("EDF+C").encode("ascii"))
+            f.write("{:<44s}".format("EDF+C" if continuous else "EDF+D")
+                    .encode("ascii"))
         else:
             f.write("{:<44s}".format(" ").encode("ascii"))
         # [236-243,8]    Number of data records, -1 for unknown
@@ -302,8 +322,26 @@ class EDF(object):
         f.write("{:<4d}".format(n_signal).encode("ascii"))
 
     def WriteDataBlock(self, data, start):
+        """
+        Writes data records. Data of each channel must contain the 
+        same number of records. Data of type EDF.DTYPE is written
+        without conversion.
+
+        Parameters
+        ----------
+        data : list(array_like(int))
+            list of raw data, one per channel
+        start : datetime
+            time of first data point
+
+        Returns
+        -------
+        int
+            number of written bytes
+        """
         if len(data) != len(self.Channels):
             raise Exception("EDF: mismuch data array dimensions")
+        data = [self.__toDtype(d) for d in data]
         records = int(len(data[0]) / (self.RecordDuration
                       * self.Channels[0].GetFrequency())
                       )
@@ -324,32 +362,47 @@ class EDF(object):
             total_block_size += 8
 
         dt = (start - self.StartTime).total_seconds()
-        start_pos = self.__file.tell()
-        for r in range(0, records):
-
-            s = self.__file.tell()
-            for d, block_size, ch in zip(data, blocks, self.Channels):
-                self.__file.write(struct.pack("<"+"h"*block_size,
-                                  *d[r*block_size:(r+1)*block_size]))
-            if self.__EDFplus:
-                t_stamp = format(self.RecordDuration*r + dt, '+13f')\
-                        .encode("utf_8").strip()[0:13]
-                t_stamp += b'\x14\x14\x00' + b'\x00'*(16 - len(t_stamp) - 3)
-                self.__file.write(t_stamp)
-
-            self.__records += 1
-            written = self.__file.tell() - s
-            if written != total_block_size*2:
-                raise Exception("Record {} (at {}sec)Written {} bytes, "
-                                "expected to write {}"
-                                .format(r, dt, written, total_block_size * 2))
+        # Each row is a data record, channels are concatenated
+        buff = numpy.empty((records, total_block_size), dtype=self.DTYPE)
+        col = 0
+        for d, block_size in zip(data, blocks):
+            buff[:, col:col + block_size] = d[0:records * block_size]\
+                    .reshape(records, block_size)
+            col += block_size
+        if self.__EDFplus:
+            # Time-stamping annotation list of each record
+            t_stamp = numpy.char.mod('%+13f', self.RecordDuration
+                                     * numpy.arange(records) + dt)
+            t_stamp = numpy.char.strip(t_stamp).astype("S13")
+            t_stamp = numpy.char.add(t_stamp, b'\x14\x14').astype("S16")
+            buff[:, col:] = numpy.frombuffer(t_stamp.tobytes(),
+                                             dtype=self.DTYPE)\
+                .reshape(records, 8)
 
+        start_pos = self.__file.tell()
+        self.__file.write(buff.tobytes())
+        self.__records += records
         written = self.__file.tell() - start_pos
         if written != records*total_block_size*2:
             raise Exception("EDF: Written {} bytes, expected to write {}"
                             .format(written, records*total_block_size * 2))
         return written
 
+    def __toDtype(self, data):
+        """
+        Converts data to EDF sample type, checking that
+        values are in range
+        """
+        if isinstance(data, numpy.ndarray) and data.dtype == self.DTYPE:
+            return data
+        data = numpy.asarray(data)
+        if data.size > 0:
+            info = numpy.iinfo(self.DTYPE)
+            if data.min() < info.min or data.max() > info.max:
+                raise ValueError("EDF: values out of range [{}, {}]"
+                                 .format(info.min, info.max))
+        return data.astype(self.DTYPE)
+
     def Close(self):
         self.__file.seek(236)
         self.__file.write("{:<8d}".format(self.__records).encode("ascii"))
@@ -24,11 +24,16 @@
 
 
 import struct
-import io
+import os
+import mmap
 from datetime import datetime
 import logging
 
+import numpy
+
 from DataStructure.Generic.Channel import GenChannel
+from tools.filepool import FilePool
+from tools.calibration import CompileExpression
 
 Logger = logging.getLogger("EmblaChannel")
 
@@ -136,80 +141,57 @@ class EmbChannel(GenChannel):
         b'\xff\xff\xff\xff' : Field("UnknownType", "h")
     } 
 
+    """ Fields indexed by their name"""
+    _Fields = {f.Name: f for f in _Marks.values()}
+
+    """ Embla file signatures"""
+    _Signatures = [b'Embla data file', b'Embla results file',
+                   b'Embla raw file']
+
     __slots__ = [x.Name for x 
                  in list(_Marks.values())] + [
-                         "Endian", "Wide", "_stream",
-                         "_seqStart", "_totSize", "_dataSize"]
+                         "Endian", "Wide", "_path", "_pool", "_fileSize",
+                         "_seqStart", "_totSize", "_dataSize",
+                         "_dataFormat", "_dtype", "_mmap", "_seqData",
+                         "_fieldTable", "_mapPending", "_blockCache"]
 
-    def __init__(self, filename):
+    def __init__(self, filename, memmap=True, pool=None, cache=None,
+                 blockCache=None):
         super(EmbChannel, self).__init__()
-        for f in self.__slots__:
-            if f[0:1] != "_":
-                setattr(self, f, None)
-
         self._seqStart = []
         self._totSize = 0
         self._dataSize = 0
-
-        self._stream = open(filename, "rb")
-        if not isinstance(self._stream, (io.RawIOBase, io.BufferedIOBase)):
-            raise Exception("Stream is not valid")
-        self._stream.seek(0)
-
-        # Reading header
-        buff = b''
-        ch = self._stream.read(1)
-
-        while ch != b'\x1a':
-            buff = buff + ch
-            ch = self._stream.read(1)
-
-        if (buff.decode('ascii') != 'Embla data file')\
-                and (buff.decode('ascii') != 'Embla results file')\
-                and (buff.decode('ascii') != 'Embla raw file'):
-            raise Exception("We are not reading either Embla results "
-                            "or Embla data")
-        ch = self._stream.read(1)
-        if ch == b'\xff':
-            self.Endian = '>'
-        elif ch == b'\x00':
-            self.Endian = '<'
+        self._mmap = None
+        self._seqData = None
+        self._fieldTable = dict()
+        self._mapPending = memmap
+        # Used only if file is not mapped
+        self._blockCache = blockCache
+
+        self._path = filename
+        # Files are opened only when needed, the pool limits
+        # the number of simultaneously opened files
+        if pool is None:
+            pool = FilePool(1)
+        self._pool = pool
+
+        state = None
+        if cache is not None:
+            state = cache.Load(filename)
+        if state is not None:
+            # File will be touched only at first data access
+            self._setState(state)
         else:
-            raise Exception("Can't determine endian")
-
-        self.Wide = False
-        ch = self._stream.read(1)
-        if (ch == b'\xff'):
-            ch = self._stream.read(4)
-            if ch == b'\xff\xff\xff\xff':   
-                self.Wide = True
-                self._stream.seek(32 - 6,1)
-
-        if self.Wide:
-            self._Marks[b'\x20\x00\x00\x00'].Format = 'h'
-            self._dataSize = 2
-        else:
-            self._Marks[b'\x20\x00\x00\x00'].Format = 'b'
-            self._dataSize = 1
-
-        while True:
-            start = self._stream.tell()
-            if self.Wide :
-                index = self._stream.read(4)
-            else:
-                index = self._stream.read(2)
-                index = index + b'\x00\x00'
-            if(index == b''):break
-            size = self._stream.read(4)
-            size = struct.unpack("<L", size)[0]
-            readed = self._read(index, size)
-            if (readed != size):
-                Logger.warning('In file "{}" at {}'
-                               .format(self._stream.name, start))
-                Logger.warning("Readed {} bytes, {} expected. "
-                               "File seems to be corrupted"
-                               .format(readed, size))
-                self._stream.seek(0,2)
+            self._fileSize = os.path.getsize(filename)
+            if memmap:
+                self._mapFile()
+            pos = self._readHeader()
+            self._setDataFormat()
+            self._scanFields(pos)
+            if cache is not None:
+                cache.Save(filename, self._getState())
+            if memmap:
+                self._mapData()
         self._totSize = sum(self._seqSize)
 
         # Finalizing initialization
@@ -250,20 +232,14 @@ class EmbChannel(GenChannel):
             self._digMax = int(self.RawRange[1] / self.RawRange[2])
             self.SetScale(self.RawRange[2])
         if isinstance(self.CalFunc, str) and self.CalFunc != "":
-            # God help us all
-            # x is used implicetly in eval
-            Logger.warning("Channel uses calibration function '" 
-                           + self.CalFunc + 
-                           "'. Actually only linear calibrations "
-                           "are supported. If function is not linear, "
-                           "retrieved values will be incorrect.")
-            x = self.GetPhysMin()
-            new_min = eval(self.CalFunc)
-            x = self.GetPhysMax()
-            new_max = eval(self.CalFunc)
-            self.SetPhysicalRange(new_min, new_max)
-            # Just for PEP8 conformity
-            x
+            Logger.debug("{}: Channel uses calibration function '{}'"
+                         .format(self.GetName(), self.CalFunc))
+            try:
+                self.SetCalibration(CompileExpression(self.CalFunc))
+            except ValueError as e:
+                Logger.warning("{}: Calibration function '{}' is not "
+                               "supported and will be ignored: {}"
+                               .format(self.GetName(), self.CalFunc, e))
 
         self.OptimizeMagnitude()
 
@@ -290,73 +266,394 @@ class EmbChannel(GenChannel):
         return string
 
     def __del__(self):
-        self._stream.close()
-
-    def _read(self, marker, size):
-        start = self._stream.tell()
-        if marker not in self._Marks:
-            raise KeyError("Marker {} not in the list for channel from {}"
-                           .format(marker, self._stream.name))
-        dtype = self._Marks[marker]
-        fname = dtype.Name 
-        fsize = dtype.Size 
-        ftype = dtype.Format 
-        fenc = dtype.Encoding 
-        if getattr(self, fname) is None and not dtype.IsUnique():
-            setattr(self, fname, [])
-        # tsize represents the a size of the entry, for text it is fixed to 1
-        if dtype.IsText:
-            tsize = 1
+        # Views must be released before the map can be closed
+        self._seqData = None
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                # Some views are still used outside the channel,
+                # map will be closed by garbage collector
+                pass
+        self._pool.Close(self._path)
+
+    def __getattr__(self, name):
+        """
+        Decodes the field at its first access.
+        Called only if slot is not yet initialized.
+        """
+        if name[0:1] == "_" or name not in self._Fields:
+            raise AttributeError("'{}' object has no attribute '{}'"
+                                 .format(self.__class__.__name__, name))
+        value = self._decode(name)
+        setattr(self, name, value)
+        return value
+
+    def _mapFile(self):
+        """
+        Maps the ebm file in memory. If file can't be mapped (empty
+        file, unsupported file system), the data will be read
+        directly from stream.
+        """
+        try:
+            # Mapping stays valid after file is closed
+            with open(self._path, "rb") as f:
+                self._mmap = mmap.mmap(f.fileno(), 0,
+                                       access=mmap.ACCESS_READ)
+        except (OSError, ValueError) as e:
+            Logger.debug("{}: Unable to map file in memory ({}). "
+                         "Data will be read from stream"
+                         .format(self._path, e))
+            self._mmap = None
+
+    def _mapData(self):
+        """
+        Maps the file in memory, if not yet mapped, and creates 
+        a typed view on mapped file for each data sequence
+        """
+        self._mapPending = False
+        if self._mmap is None:
+            self._mapFile()
+        if self._mmap is None:
+            return
+        self._seqData = []
+        for start, size in zip(self._seqStart, self._seqSize):
+            # Corrupted files can have truncated last sequence
+            avail = max(0, (len(self._mmap) - start) // self._dataSize)
+            self._seqData.append(numpy.frombuffer(self._mmap,
+                                                  dtype=self._dtype,
+                                                  count=min(size, avail),
+                                                  offset=start))
+
+    def _setDataFormat(self):
+        """
+        Sets the format of data points from file width and endianness
+        """
+        if self.Wide:
+            self._dataFormat = 'h'
+            self._dataSize = 2
+            self._dtype = numpy.dtype(self.Endian + 'i2')
         else:
-            tsize = int(struct.calcsize(self.Endian + ftype))
-        dsize = size  # Lenth of the field
-        nwords = int(dsize / tsize)  # Number of entries in the field
-
-        if fsize > 0 and nwords != fsize:
-            raise Exception("Field contains {} words, {} requested"
-                            .format(nwords, fsize))
-
-        if dtype.IsText:
-            text = self._stream.read(size).decode(fenc).strip('\0')
-            if dtype.IsUnique():
-                setattr(self, fname, text)
-            else:
-                setattr(self, fname, getattr(self, fname) + [text])
-        else: 
-            if fname == "UnknownType":
-                # Put warning here: unknown size, corrupted file?
-                Logger.warning("Unknown data type")
-                # Jumping to EOF
-                return self._stream.tell() - start
-            if fname == "Data":
-                self._seqStart.append(self._stream.tell())
-                self._seqSize.append(nwords)
-                self._stream.seek(size, 1)
-                return self._stream.tell() - start
-            dec = self.Endian + ftype * nwords + 'x' * (dsize - tsize * nwords)
-            unpacked = struct.unpack(dec, self._stream.read(size))
-            if fname == "Version":
+            self._dataFormat = 'b'
+            self._dataSize = 1
+            self._dtype = numpy.dtype('i1')
+
+    def _getState(self):
+        """
+        Returns the parsed header as a dictionary of serializable
+        objects, all fields present in file are decoded.
+
+        Returns
+        -------
+        dict
+        """
+        fields = dict()
+        for name in self._fieldTable:
+            value = getattr(self, name)
+            if name == "Time":
+                value = [t.isoformat(timespec="microseconds")
+                         for t in value]
+            fields[name] = value
+        return {"Endian": self.Endian,
+                "Wide": self.Wide,
+                "FileSize": self._fileSize,
+                "SeqStart": self._seqStart,
+                "SeqSize": self._seqSize,
+                "Fields": fields
+                }
+
+    def _setState(self, state):
+        """
+        Restores the parsed header from dictionary created by _getState
+
+        Parameters
+        ----------
+        state : dict
+        """
+        self.Endian = state["Endian"]
+        self.Wide = state["Wide"]
+        self._fileSize = state["FileSize"]
+        self._seqStart = state["SeqStart"]
+        self._seqSize = state["SeqSize"]
+        self._setDataFormat()
+        for name, value in state["Fields"].items():
+            if name == "Time":
+                value = [datetime.strptime(t, "%Y-%m-%dT%H:%M:%S.%f")
+                         for t in value]
+            self._fieldTable[name] = []
+            setattr(self, name, value)
+
+    def _readAt(self, pos, size):
+        """
+        Reads size bytes from file, starting at pos
+        """
+        if self._mmap is not None:
+            return self._mmap[pos:pos + size]
+        return self._pool.Read(self._path, pos, size)
+
+    def _readPoints(self, pos, count):
+        """
+        Reads count data points from file, starting at pos.
+        If file is truncated, only the complete points are returned.
+        """
+        data = self._readAt(pos, count * self._dataSize)
+        return numpy.frombuffer(data, dtype=self._dtype,
+                                count=len(data) // self._dataSize)
+
+    @classmethod
+    def Probe(cls, filename, pool=None, cache=None):
+        """
+        Retrieves the name of channel without parsing the whole file.
+        Only the markers preceding the channel name are read.
+
+        Parameters
+        ----------
+        filename : str
+            path to ebm file
+        pool : FilePool, optional
+            pool of opened files to use
+        cache : HeaderCache, optional
+            header cache, used if contains given file
+
+        Returns
+        -------
+        str or None
+            name of channel, None if file do not define it
+        """
+        if cache is not None:
+            state = cache.Load(filename)
+            if state is not None:
+                return state["Fields"].get("ChannName")
+        if pool is None:
+            pool = FilePool(1)
+
+        def read(pos, size):
+            return pool.Read(filename, pos, size)
+
+        endian, wide, pos = cls._parseSignature(read(0, 64))
+        field = cls._Fields["ChannName"]
+        for f, start, size in cls._iterMarkers(read, pos, wide,
+                                               os.path.getsize(filename),
+                                               filename):
+            if f is field:
+                return read(start, size).decode(f.Encoding).strip('\0')
+        return None
+
+    @staticmethod
+    def _parseSignature(buff):
+        """
+        Reads file signature, endianness and width of markers
+        from the beginning of file.
+
+        Parameters
+        ----------
+        buff : bytes
+            first bytes of file
+
+        Returns
+        -------
+        (str, bool, int)
+            endianness, width of markers and position of first 
+            field marker
+        """
+        pos = buff.find(b'\x1a')
+        if pos < 0 or buff[0:pos] not in EmbChannel._Signatures:
+            raise Exception("We are not reading either Embla results "
+                            "or Embla data")
+        ch = buff[pos + 1:pos + 2]
+        if ch == b'\xff':
+            endian = '>'
+        elif ch == b'\x00':
+            endian = '<'
+        else:
+            raise Exception("Can't determine endian")
+
+        if buff[pos + 2:pos + 3] != b'\xff':
+            return endian, False, pos + 3
+        if buff[pos + 3:pos + 7] == b'\xff\xff\xff\xff':
+            return endian, True, pos + 33
+        return endian, False, pos + 7
+
+    @staticmethod
+    def _iterMarkers(read, pos, wide, fileSize, path):
+        """
+        Iterates over field markers of file. Stops at end of file,
+        at truncated marker or at marker of unknown data type.
+
+        Parameters
+        ----------
+        read : callable
+            function reading (pos, size) bytes from file
+        pos : int
+            position of first marker in file
+        wide : bool
+            width of markers
+        fileSize : int
+            size of file
+        path : str
+            path to file, used in messages
+
+        Yields
+        ------
+        (Field, int, int)
+            field description, position and size of its content
+
+        Raises
+        ------
+        KeyError
+            if an unknown marker is found
+        """
+        if wide:
+            m_size = 4
+        else:
+            m_size = 2
+        while pos < fileSize:
+            head = read(pos, m_size + 4)
+            if len(head) != m_size + 4:
+                Logger.warning('In file "{}" at {}'.format(path, pos))
+                Logger.warning("Truncated field marker. "
+                               "File seems to be corrupted")
+                return
+            marker = head[0:m_size] + b'\x00' * (4 - m_size)
+            size = struct.unpack("<L", head[m_size:])[0]
+            if marker not in EmbChannel._Marks:
+                raise KeyError("Marker {} not in the list for channel "
+                               "from {}".format(marker, path))
+            field = EmbChannel._Marks[marker]
+            start = pos + m_size + 4
+            pos = start + size
+            yield field, start, size
+            if field.Name == "UnknownType" and size != 0:
+                # Unknown size, jumping to EOF
+                Logger.warning('In file "{}" at {}'.format(path, start))
+                Logger.warning("Unknown data type of {} bytes. "
+                               "File seems to be corrupted"
+                               .format(size))
+                return
+
+    def _readHeader(self):
+        """
+        Reads file signature, endianness and width of markers.
+
+        Returns
+        -------
+        int
+            position of the first field marker
+        """
+        self.Endian, self.Wide, pos = self._parseSignature(
+                self._readAt(0, 64))
+        return pos
+
+    def _scanFields(self, pos):
+        """
+        Scans the file starting from pos and builds the table of 
+        field positions. Only the data sequences are registered, 
+        the values of other fields are decoded at their first access.
+
+        Parameters
+        ----------
+        pos : int
+            position of first marker in file
+
+        Raises
+        ------
+        KeyError
+            if an unknown marker is found
+        Exception
+            if number of words in field is not the expected one
+        """
+        for field, start, size in self._iterMarkers(self._readAt, pos, 
+                                                    self.Wide, 
+                                                    self._fileSize,
+                                                    self._path):
+            if field.Name == "UnknownType":
+                self._fieldTable.setdefault(field.Name, [])
+                continue
+
+            if start + size > self._fileSize:
+                Logger.warning('In file "{}" at {}'
+                               .format(self._path, start))
+                Logger.warning("Readed {} bytes, {} expected. "
+                               "File seems to be corrupted"
+                               .format(self._fileSize - start, size))
+                if field.IsText:
+                    # Truncated text is kept, as it was read before
+                    self._fieldTable.setdefault(field.Name, []).append(
+                            (start, max(0, self._fileSize - start)))
+                if field.Name != "Data":
+                    break
+
+            if field.Name == "Data":
+                self._seqStart.append(start)
+                self._seqSize.append(size // self._dataSize)
+                continue
+            if field.Size > 0 and not field.IsText:
+                nwords = size // struct.calcsize(self.Endian + field.Format)
+                if nwords != field.Size:
+                    raise Exception("Field contains {} words, {} requested"
+                                    .format(nwords, field.Size))
+            self._fieldTable.setdefault(field.Name, []).append((start, size))
+
+    def _decode(self, name):
+        """
+        Decodes the value of given field from file.
+        If field is not unique, a list of all entries is returned.
+
+        Parameters
+        ----------
+        name : str
+            name of field
+
+        Returns
+        -------
+        value of field, None if field is absent from file
+        """
+        if name == "Data":
+            if len(self._seqStart) > 0: return []
+            return None
+        if name not in self._fieldTable:
+            return None
+        dtype = self._Fields[name]
+        values = []
+        for start, size in self._fieldTable[name]:
+            data = self._readAt(start, size)
+            if dtype.IsText:
+                values.append(data.decode(dtype.Encoding).strip('\0'))
+                continue
+            tsize = struct.calcsize(self.Endian + dtype.Format)
+            nwords = size // tsize
+            unpacked = struct.unpack(self.Endian + dtype.Format * nwords
+                                     + 'x' * (size - tsize * nwords), data)
+            if name == "Version":
                 if self.Endian == '>':
                     big, small = unpacked
                 else:
                     small, big = unpacked
                 if small > 100: small = small / 100
                 else: small = small / 10
-                self.Version = big + small / 10
-            elif fname == "Time":
+                values.append(big + small / 10)
+            elif name == "Time":
                 year, mon, day, h, m, s, us = unpacked
-                time = datetime(year, mon, day, h, m, s, us * 10000)
-                self.Time = self.Time + [time]
+                values.append(datetime(year, mon, day, h, m, s, us * 10000))
+            elif len(unpacked) == 1 and dtype.IsUnique():
+                values.append(unpacked[0])
             else:
-                if dtype.IsUnique():
-                    if len(unpacked) == 1:
-                        setattr(self, fname, unpacked[0])
-                    else:
-                        setattr(self, fname, list(unpacked))
-                else:
-                    setattr(self, fname,
-                            getattr(self, fname) + [list(unpacked)])
-        return self._stream.tell() - start
+                values.append(list(unpacked))
+
+        if dtype.IsUnique():
+            # In case of multiple entries, the last one is retained
+            return values[-1]
+        return values
+
+    def GetTrueFrequency(self):
+        """
+        Returns the sampling frequency as measured by acquisition
+        device (DBLsampling), corrected by rate correction factor
+        """
+        rate = self.DBLsampling
+        if self.RateCorr is not None:
+            rate *= 1 + self.RateCorr
+        return rate
 
     def _getValue(self, point, sequence):
         """
@@ -378,10 +675,17 @@ class EmbChannel(GenChannel):
             the value of required point
         """
 
-        self._stream.seek(self._seqStart[sequence] + (point) * self._dataSize)
-        val = struct.unpack(
-                self.Endian + self._Marks[b'\x20\x00\x00\x00'].Format,
-                self._stream.read(self._dataSize))[0]
+        if self._mapPending:
+            self._mapData()
+        if self._seqData is not None:
+            d = self._seqData[sequence][point:point + 1]
+        else:
+            d = self._readData(point, 1, sequence)
+        if len(d) != 1:
+            raise IOError("Got {} entries insted of expected {} "
+                          "while reading {}".format(len(d), 1, self._path)
+                          )
+        val = int(d[0])
         if val > self._digMax: val = self._digMax
         if val < self._digMin: val = self._digMin
         return val
@@ -403,8 +707,9 @@ class EmbChannel(GenChannel):
 
         Returns
         -------
-        list(int)
-            a list of readed data
+        numpy.ndarray
+            readed data. The array is read-only, and if file is 
+            mapped in memory, it is a view on the file
 
         Raises
         ------
@@ -413,18 +718,92 @@ class EmbChannel(GenChannel):
         """
         if size < 0 or size > self._seqSize[sequence] - index:
             size = self._seqSize[sequence] - index
-        self._stream.seek(self._seqStart[sequence] + index * self._dataSize)
-        data = self._stream.read(self._dataSize * size)
-        if len(data) != size * self._dataSize:
+        if self._mapPending:
+            self._mapData()
+        if self._seqData is not None:
+            d = self._seqData[sequence][index:index + size]
+            if len(d) != size:
+                raise IOError("Got {} entries insted of expected {} "
+                              "while reading {}".format(len(d), size,
+                                                        self._path)
+                              )
+            return d
+        d = self._readData(index, size, sequence)
+        if len(d) != size:
             raise IOError("Got {} entries insted of expected {} "
-                          "while reading {}".format(len(data), size, 
-                                                    self._stream.name)
+                          "while reading {}".format(len(d), size, 
+                                                    self._path)
                           )
-        d = struct.unpack(self.Endian
-                          + self._Marks[b'\x20\x00\x00\x00'].Format
-                          * size, data)
         return d
 
+    def _readData(self, index, size, sequence):
+        """
+        Reads size points from a given sequence starting from index,
+        directly from file or through the block cache if defined.
+        Reads are split into cache blocks, missing consecutive blocks
+        being read at once. Sequential reading is detected by cache,
+        in which case the next block is read together with requested ones.
+
+        Do not check parameters validity.
+
+        Parameters
+        ----------
+        index : int
+            index from where data will be read
+        size : int
+            number of data-points retrieved
+        sequence :
+            index of sequence to be read from
+
+        Returns
+        -------
+        numpy.ndarray
+            readed data, can be shorter than requested if file is 
+            truncated
+        """
+        if self._blockCache is None or size <= 0:
+            return self._readPoints(self._seqStart[sequence]
+                                    + index * self._dataSize, size)
+        cache = self._blockCache
+        b_size = cache.BlockSize
+        stream = (self._path, sequence)
+        first = index // b_size
+        last = (index + size - 1) // b_size
+        n_blocks = (self._seqSize[sequence] + b_size - 1) // b_size
+
+        blocks = [cache.Get(stream, b) for b in range(first, last + 1)]
+        ahead = cache.IsSequential(stream, first, last)\
+            and last + 1 < n_blocks\
+            and cache.Get(stream, last + 1) is None
+        b = first
+        while b <= last + ahead:
+            if b <= last and blocks[b - first] is not None:
+                b += 1
+                continue
+            # Reading consecutive missing blocks at once
+            e = b
+            while e < last and blocks[e + 1 - first] is None:
+                e += 1
+            if e == last and ahead:
+                e += 1
+            start = b * b_size
+            end = min((e + 1) * b_size, self._seqSize[sequence])
+            data = self._readPoints(self._seqStart[sequence]
+                                    + start * self._dataSize, end - start)
+            for i in range(b, e + 1):
+                block = data[(i - b) * b_size:(i - b + 1) * b_size]
+                # Cached view would keep the whole read buffer alive
+                cache.Put(stream, i, block.copy())
+                if i <= last:
+                    blocks[i - first] = block
+            b = e + 1
+
+        if len(blocks) == 1:
+            data = blocks[0]
+        else:
+            data = numpy.concatenate(blocks)
+        return data[index - first * b_size:index - first * b_size + size]
+
     def __lt__(self, other):
         if type(other) != type(self):
             raise TypeError("Comparaison arguments must be of the same class")
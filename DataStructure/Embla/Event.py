@@ -25,6 +25,10 @@
 
 import struct
 from datetime import datetime
+from datetime import MINYEAR
+from datetime import MAXYEAR
+
+import numpy
 
 class EbmEvent(object):
     """Structure for Event-type data"""
@@ -68,22 +72,146 @@ class EbmEvent(object):
         self.CreatorID   = parced[6]
 
 
+"""Layout of 112-bytes event record, as read by EbmEvent"""
+_EventDtype = numpy.dtype({
+        "names": ["LocationIdx", "AuxDataID", "GroupTypeIdx",
+                  "StartTime", "TimeSpan", "ScoreID", "CreatorID",
+                  "EventID"],
+        "formats": ["<u2", "<u2", "<u4", "<f8", "<f8", "<u4", "i1", "V78"],
+        "offsets": [0, 2, 4, 8, 16, 24, 28, 32],
+        "itemsize": 112})
+
+"""Layout of 12-bytes event start time record"""
+_StartTimeDtype = numpy.dtype({
+        "names": ["Year", "Month", "Day", "Hour", "Minute", "Second",
+                  "Microsecond"],
+        "formats": ["<u2", "u1", "u1", "u1", "u1", "u1", "<u4"],
+        "offsets": [0, 2, 3, 4, 5, 6, 8],
+        "itemsize": 12})
+
+
+class EbmEventTable(object):
+    """
+    Columnar table of Embla events, decoded from events record.
+    Each field of EbmEvent is accessible as numpy array by GetColumn,
+    event identifiers are decoded at first request, once per distinct
+    identifier. Iterating over table or indexing it creates EbmEvent
+    objects, as returned by previous versions of ReadEvents.
+    """
+    __slots__ = ["__data", "__ids", "__idCodes"]
+
+    def __init__(self, data):
+        self.__data = numpy.frombuffer(data, dtype=_EventDtype)
+        self.__ids = None
+        self.__idCodes = None
+
+    def __len__(self):
+        return len(self.__data)
+
+    def __getitem__(self, index):
+        return EbmEvent(self.__data[index].tobytes())
+
+    def __iter__(self):
+        for index in range(len(self.__data)):
+            yield self[index]
+
+    def GetColumn(self, name):
+        """
+        Returns the values of given field for all events
+
+        Parameters
+        ----------
+        name : str
+            name of field, one of EbmEvent slots except EventID
+
+        Returns
+        -------
+        numpy.ndarray
+        """
+        if name == "EventID":
+            raise KeyError("EventID is retrieved by GetEventIds")
+        return self.__data[name]
+
+    def GetEventIds(self):
+        """
+        Returns the list of distinct event identifiers and
+        the index in this list of the identifier of each event
+
+        Returns
+        -------
+        (list(str), numpy.ndarray(int))
+        """
+        if self.__ids is None:
+            raw = self.__data["EventID"]
+            uniq, self.__idCodes = numpy.unique(raw, return_inverse=True)
+            self.__ids = [u.tobytes().decode('utf_16_le') for u in uniq]
+        return self.__ids, self.__idCodes
+
+
+class EbmStartTimes(object):
+    """
+    Columnar table of events start times. Times are kept as
+    numpy datetime64 array with microsecond resolution, iterating
+    over table gives datetime objects.
+    """
+    __slots__ = ["__times"]
+
+    def __init__(self, data):
+        d = numpy.frombuffer(data, dtype=_StartTimeDtype)
+        year = d["Year"].astype(numpy.int64)
+        month = d["Month"].astype(numpy.int64)
+        day = d["Day"].astype(numpy.int64)
+        # Same checks and errors as datetime constructor
+        self.__check(year, MINYEAR, MAXYEAR, "year {} is out of range")
+        self.__check(month, 1, 12, "month must be in 1..12")
+        months = (year - 1970) * 12 + month - 1
+        first = months.astype("M8[M]").astype("M8[D]")
+        month_len = ((months + 1).astype("M8[M]").astype("M8[D]")
+                     - first).astype(numpy.int64)
+        self.__check(day, 1, month_len, "day is out of range for month")
+        self.__check(d["Hour"], 0, 23, "hour must be in 0..23")
+        self.__check(d["Minute"], 0, 59, "minute must be in 0..59")
+        self.__check(d["Second"], 0, 59, "second must be in 0..59")
+        self.__check(d["Microsecond"], 0, 999999,
+                     "microsecond must be in 0..999999")
+
+        days = first + (day - 1)
+        usec = ((d["Hour"].astype(numpy.int64) * 60 + d["Minute"]) * 60
+                + d["Second"]) * 1000000 + d["Microsecond"]
+        self.__times = days.astype("M8[us]") + usec.astype("m8[us]")
+
+    @staticmethod
+    def __check(values, low, high, message):
+        """
+        Raises ValueError with message, formatted with the first
+        invalid value, if values are not within [low, high]
+        """
+        invalid = numpy.flatnonzero((values < low) | (values > high))
+        if len(invalid) > 0:
+            raise ValueError(message.format(values[invalid[0]]))
+
+    def __len__(self):
+        return len(self.__times)
+
+    def __getitem__(self, index):
+        return self.__times[index].astype(datetime)
+
+    def __iter__(self):
+        return iter(self.__times.tolist())
+
+    def GetTimes(self):
+        """Returns start times as numpy.datetime64 array"""
+        return self.__times
+
+
 def ReadEvents(data):
-    """Reads and extracts the list of events from data, returns the list of Event objects"""
+    """Reads and extracts events from data, returns EbmEventTable"""
     if len(data)%112 != 0:
         raise Exception("Data size is not multiple of 112, events record is corrupted")
-    array = []
-    for pos in range(0, len(data), 112):
-        array.append(EbmEvent(data[pos:pos+112]))
-    return array
+    return EbmEventTable(data)
 
 def ReadEventsStartTime(data):
-    """Reads and extracts list of starttime from data, return the list of datetime objects"""
+    """Reads and extracts start times from data, return EbmStartTimes"""
     if len(data)%12 != 0:
-        raise Exception("Data size is not multiple of 112, events record is corrupted")
-    array = []
-    for pos in range(0, len(data), 12):
-        y,m,d,h,minute,sec,usec = struct.unpack("<HBBBBBxI", data[pos:pos+12])
-        array.append(datetime(y,m,d,h,minute, sec, usec))
-    return array
-    
+        raise Exception("Data size is not multiple of 12, events record is corrupted")
+    return EbmStartTimes(data)
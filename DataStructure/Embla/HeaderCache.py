@@ -0,0 +1,128 @@
+#############################################################################
+## HeaderCache contains routines to store parsed headers of Embla channels
+#############################################################################
+## Copyright (c) 2018-2019, University of Liège
+## Author: Nikita Beliy
+## Owner: Liege University https://www.uliege.be
+## Version: 0.77r5
+## Maintainer: Nikita Beliy
+## Email: Nikita.Beliy@uliege.be
+## Status: developpement
+#############################################################################
+## This file is part of eegBidsCreator
+## eegBidsCreator is free software: you can redistribute it and/or modify
+## it under the terms of the GNU General Public License as published by
+## the Free Software Foundation, either version 2 of the License, or
+## (at your option) any later version.
+## eegBidsCreator is distributed in the hope that it will be useful,
+## but WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+## GNU General Public License for more details.
+## You should have received a copy of the GNU General Public License
+## along with eegBidsCreator.  If not, see <https://www.gnu.org/licenses/>.
+############################################################################
+
+
+import os
+import json
+import hashlib
+import logging
+
+Logger = logging.getLogger(__name__)
+
+
+class HeaderCache(object):
+    """
+    Persistent cache of parsed ebm headers. Each channel file
+    is stored as a json file in cache directory, named after
+    hash of the real path of channel file. An entry is valid
+    only if size and modification time of channel file didn't
+    change since its creation.
+    """
+    # Version of stored data, changing it invalidates existing caches
+    _VERSION = 1
+
+    __slots__ = ["_directory"]
+
+    def __init__(self, directory):
+        """
+        Parameters
+        ----------
+        directory : str
+            path to cache directory, will be created if not existing
+        """
+        self._directory = os.path.realpath(directory)
+        os.makedirs(self._directory, exist_ok=True)
+
+    def _key(self, path):
+        """
+        Returns real path of file, its stat and the path to
+        corresponding cache entry
+        """
+        path = os.path.realpath(path)
+        stat = os.stat(path)
+        entry = hashlib.sha1(path.encode("utf-8")).hexdigest() + ".json"
+        return path, stat, os.path.join(self._directory, entry)
+
+    def Load(self, path):
+        """
+        Retrieves parsed header of given file
+
+        Parameters
+        ----------
+        path : str
+            path to channel file
+
+        Returns
+        -------
+        dict or None
+            stored header state, None if file is not in cache
+            or was modified since
+        """
+        path, stat, entry = self._key(path)
+        if not os.path.isfile(entry):
+            return None
+        try:
+            with open(entry, "r") as f:
+                cached = json.load(f)
+        except (OSError, ValueError) as e:
+            Logger.debug("{}: Unable to read cache entry ({})"
+                         .format(entry, e))
+            return None
+        if cached.get("Version") != self._VERSION\
+                or cached.get("Path") != path\
+                or cached.get("Size") != stat.st_size\
+                or cached.get("MTime") != stat.st_mtime_ns:
+            Logger.debug("{}: Cache entry is outdated".format(path))
+            return None
+        return cached["State"]
+
+    def Save(self, path, state):
+        """
+        Stores parsed header of given file. Failure to write the
+        cache is reported but not fatal.
+
+        Parameters
+        ----------
+        path : str
+            path to channel file
+        state : dict
+            json-serializable header state
+        """
+        path, stat, entry = self._key(path)
+        cached = {"Version": self._VERSION,
+                  "Path": path,
+                  "Size": stat.st_size,
+                  "MTime": stat.st_mtime_ns,
+                  "State": state
+                  }
+        tmp = entry + ".{}.tmp".format(os.getpid())
+        try:
+            with open(tmp, "w") as f:
+                json.dump(cached, f)
+            os.replace(tmp, entry)
+        except (OSError, TypeError, ValueError) as e:
+            Logger.warning("{}: Unable to write header cache ({})"
+                           .format(path, e))
+            if os.path.exists(tmp):
+                os.remove(tmp)
@@ -27,23 +27,40 @@ from DataStructure.Generic.Record import Record
 import olefile
 import glob
 import logging
+from concurrent.futures import ThreadPoolExecutor
 import xml.etree.ElementTree as ElementTree
 from datetime import datetime
 
+import numpy
+
 from tools import exceptions as error
 
 from Parcel.parcel import Parcel
 from DataStructure.Generic.Event import GenEvent
 from DataStructure.Embla.Channel import EmbChannel
+from DataStructure.Embla.HeaderCache import HeaderCache
+from tools.filepool import FilePool
+from tools.blockcache import BlockCache
 
 Logger = logging.getLogger(__name__)
 
 
 class EmbRecord(Record):
 
-    def __init__(self):
+    def __init__(self, memmap=True, maxOpenFiles=64, headerCache="",
+                 threads=1, blockCache=0):
         super(EmbRecord, self).__init__()
         self._extList = [".ebm",".ead",".esedb",".ewp",".esrc",".esev"]
+        self._memmap = memmap
+        self._filePool = FilePool(maxOpenFiles)
+        self._headerCache = None
+        if headerCache:
+            self._headerCache = HeaderCache(headerCache)
+        self._threads = max(1, threads)
+        self._blockCache = None
+        # Mapped files are cached by system
+        if blockCache > 0 and not memmap:
+            self._blockCache = BlockCache(blockCache * 1024 * 1024)
 
     def _loadMetadata(self):
         """
@@ -98,8 +115,41 @@ class EmbRecord(Record):
     def _readChannels(self, name=None):
         if name is None:
             name = "*"
-        return [EmbChannel(c) for c in 
-                glob.glob(self.GetInputPath(name + ".ebm"))]
+        return self._openChannels(
+                sorted(glob.glob(self.GetInputPath(name + ".ebm"))))
+
+    def _probeChannels(self, name=None):
+        if name is None:
+            name = "*"
+        files = sorted(glob.glob(self.GetInputPath(name + ".ebm")))
+        names = self._map(lambda f: EmbChannel.Probe(f, self._filePool,
+                                                     self._headerCache),
+                          files)
+        return list(zip(names, files))
+
+    def _openChannels(self, sources):
+        return self._map(self._openChannel, sources)
+
+    def _map(self, func, files):
+        """
+        Applies func to each file, using thread pool if allowed.
+        The order of results follows the order of files
+        """
+        if self._threads == 1 or len(files) < 2:
+            return [func(f) for f in files]
+        # Headers parsing is dominated by I/O, threads are
+        # efficient despite GIL
+        with ThreadPoolExecutor(max_workers=min(self._threads, 
+                                                len(files))) as executor:
+            return list(executor.map(func, files))
+
+    def _openChannel(self, filename):
+        """
+        Opens and parses the header of given channel file
+        """
+        return EmbChannel(filename, memmap=self._memmap, 
+                          pool=self._filePool, cache=self._headerCache,
+                          blockCache=self._blockCache)
 
     def _readEvents(self):
         events = list()
@@ -113,29 +163,66 @@ class EmbRecord(Record):
             times = root.getlist("EventsStartTimes")[0]
             locat = root.get("Locations", 0)
 
-            for ev,time in zip(evs, times):
-                ch_id = locat.getlist("Location")[ev.LocationIdx]\
-                        .get("Signaltype").get("MainType")
-                ch_id += "_" + locat.getlist("Location")[ev.LocationIdx]\
-                         .get("Signaltype").get("SubType")
+            # Flat tables resolving events indexes
+            ch_ids = [self._locationChannel(loc)
+                      for loc in locat.getlist("Location")]
+            aux_names = [self._auxType(aux)
+                         for aux in aux_l.getlist("Aux")]
 
-                try:
-                    name = grp_l[ev.GroupTypeIdx]
-                except LookupError:
-                    try:
-                        name = aux_l.get("Aux", ev.AuxDataID)\
-                               .get("Sub Classification History")\
-                               .get("1").get("type")
-                    except Exception:
-                        Logger.warning(
-                                "Can't get event name for index {}"
-                                .format(ev.AuxDataID))
-                        name = ""
-                evnt = GenEvent(Name=name, Time=time, Duration=ev.TimeSpan)
+            count = min(len(evs), len(times))
+            loc_idx = evs.GetColumn("LocationIdx")[:count]
+            grp_idx = evs.GetColumn("GroupTypeIdx")[:count]
+            aux_idx = evs.GetColumn("AuxDataID")[:count]
+
+            # Last element of tables is used for out of range indexes
+            ch_ids = numpy.array(ch_ids, dtype=object)
+            names = numpy.array(grp_l + [None], dtype=object)\
+                [numpy.minimum(grp_idx, len(grp_l))]
+            aux_names = numpy.array(aux_names + [None], dtype=object)
+            no_grp = grp_idx >= len(grp_l)
+            names[no_grp] = aux_names[numpy.minimum(aux_idx[no_grp],
+                                                    len(aux_names) - 1)]
+
+            durations = evs.GetColumn("TimeSpan")[:count].tolist()
+            for k, ch_id, name, time, duration in zip(
+                    range(count), ch_ids[loc_idx], names, times, durations):
+                if ch_id is None:
+                    raise Exception("Location {} has no signal type"
+                                    .format(loc_idx[k]))
+                if name is None:
+                    Logger.warning(
+                            "Can't get event name for index {}"
+                            .format(aux_idx[k]))
+                    name = ""
+                evnt = GenEvent(Name=name, Time=time, Duration=duration)
                 evnt.AddChannel(ch_id)
                 events.append(evnt)
         return events
 
+    @staticmethod
+    def _locationChannel(location):
+        """
+        Returns the channel id (MainType_SubType) of an event location
+        parcel, or None if location has no signal type
+        """
+        try:
+            sig = location.get("Signaltype")
+            return sig.get("MainType") + "_" + sig.get("SubType")
+        except Exception:
+            return None
+
+    @staticmethod
+    def _auxType(aux):
+        """
+        Returns the classification type of an event aux data parcel,
+        or None if it is not defined
+        """
+        try:
+            return aux.get("Sub Classification History")\
+                      .get("1").get("type")
+        except Exception:
+            return None
+
     @staticmethod
     def _isValidInput(inputPath):
         """
@@ -24,11 +24,15 @@
 ############################################################################
 
 import math
+import bisect
 from datetime import datetime
 from datetime import timedelta
 import logging
 
+import numpy
+
 from DataStructure.BIDS.BIDS import BIDSfieldLibrary
+from tools.resampler import Resampler
 
 Logger = logging.getLogger(__name__)
 
@@ -68,6 +72,7 @@ class GenChannel(BIDSfieldLibrary):
         "_digMin", "_digMax",
         "_seqStartTime",
         "_seqSize",
+        "_seqIndex",
         "_frequency",
         "_name",
         "_type",
@@ -78,6 +83,8 @@ class GenChannel(BIDSfieldLibrary):
         "_startTime",
         "_frMultiplier",
         "_baseChannel",
+        "_resampling",
+        "_calibration",
         "BIDSvalues"]
 
     BIDSfields = BIDSfieldLibrary()
@@ -96,6 +103,19 @@ class GenChannel(BIDSfieldLibrary):
     _MAXSHORT = 32767
     _MINSHORT = -32768
 
+    """Internal timeline is counted in integer ticks of one microsecond,
+    the resolution of datetime"""
+    _TICK = timedelta(microseconds=1)
+    _TICKS = 1000000
+
+    """Maximum number of points read in one block by GetValues
+    regardless of number of requested points"""
+    _MAXGAP = 4096
+
+    """Number of points of digital range on which calibration
+    function is evaluated to find physical extrema"""
+    _CALPOINTS = 4097
+
     """Dictionary of standard SI prefixes, as defined in BIDS"""
     _SIprefixes = {24:'Y', 21:'Z', 18:'E', 15:'P', 12:'T', 9:'G',
                    6:'M', 3:'k', 2:'h', 1:'da', 0:'', -1:'d', 
@@ -131,11 +151,14 @@ class GenChannel(BIDSfieldLibrary):
 
         self._seqStartTime = []
         self._seqSize = []
+        self._seqIndex = None
 
         self._startTime = datetime.min
         self._frMultiplier = 1
 
         self._baseChannel = self
+        self._resampling = None
+        self._calibration = None
         self._id = -1
         self.BIDSvalues = dict()
 
@@ -229,7 +252,60 @@ class GenChannel(BIDSfieldLibrary):
     def _fromRaw(self, value):
         """Transform raw short integer value to the measured one.
         No checks in value performed."""
-        return value * self._scale + self._offset
+        if self._calibration is None:
+            return value * self._scale + self._offset
+        func, scale, offset, ref = self._calibration
+        return func(value * scale + offset) * (self._scale / ref)
+
+    def SetCalibration(self, function):
+        """
+        Sets a calibration function applied to measured values.
+        The physical minimum and maximum are set to calibrated values
+        of digital minimum and maximum, and scale and offset become
+        the linear approximation of calibration, used for raw data.
+        For a decreasing calibration, physical minimum is greater
+        than maximum and scale is negative.
+
+        Parameters
+        ----------
+        function : callable or None
+            vectorized function (see tools.calibration) taking values
+            obtained with current scale and offset, in units without
+            magnitude. If None, calibration is removed
+
+        Raises
+        ------
+        ValueError
+            if calibrated values are not finite, not monotonic
+            or constant in digital range
+        """
+        if function is None:
+            self._calibration = None
+            return
+        magn = 10**self._magnitude
+        scale = self._scale * magn
+        offset = self._offset * magn
+        values = numpy.asarray(function(
+            numpy.linspace(self._digMin, self._digMax, self._CALPOINTS)
+            * scale + offset), dtype=numpy.float64)
+        if not numpy.all(numpy.isfinite(values)):
+            raise ValueError("Calibration gives non-finite values "
+                             "in digital range")
+        steps = numpy.diff(values)
+        if numpy.any(steps > 0) and numpy.any(steps < 0):
+            raise ValueError("Calibration is not monotonic "
+                             "in digital range")
+        if values[0] == values[-1]:
+            raise ValueError("Calibration is constant in digital range")
+        self._calibration = None
+        self._physMin = float(values[0]) / magn
+        self._physMax = float(values[-1]) / magn
+        self._calculateScale()
+        self._calibration = (function, scale, offset, self._scale * magn)
+
+    def IsCalibrated(self):
+        """Returns True if a calibration function is applied"""
+        return self._calibration is not None
 
     def ToRaw(self, value):
         """Transform measured value to raw short integer.
@@ -237,7 +313,8 @@ class GenChannel(BIDSfieldLibrary):
         if not (isinstance(value, int) or isinstance(value, float)):
             raise TypeError(self.__class__
                             + ": Value must be an integer or float")
-        if value > self._physMax or value < self._physMin:
+        if value > max(self._physMin, self._physMax)\
+                or value < min(self._physMin, self._physMax):
             raise Exception(self.__class__
                             + ": value " + str(value) + " out of the range ["
                             + str(self._physMin) + ", "
@@ -355,6 +432,20 @@ class GenChannel(BIDSfieldLibrary):
             raise TypeError("Frequency must be an integer representing Hz")
         self._frequency = freq
 
+    def GetTrueFrequency(self):
+        """
+        Returns the effective sampling frequency, including
+        the correction of clock drift if known for the format.
+        By default it is the nominal frequency.
+
+        Returns
+        -------
+        float
+        """
+        if self._baseChannel != self:
+            return self._baseChannel.GetTrueFrequency()
+        return float(self._frequency)
+
     def GetMagnitude(self):
         return self._magnitude 
 
@@ -371,7 +462,7 @@ class GenChannel(BIDSfieldLibrary):
 
     def GetSequenceEnd(self, seq=0):
         return self._seqStartTime[seq]\
-            + timedelta(seconds=self.GetSequenceDuration(seq))
+            + self._getDeltaTime(self._seqSize[seq], 1)
 
     def GetSequenceSize(self, seq=0):
         """Returns the size (number of measurements) in given sequence"""
@@ -452,10 +543,10 @@ class GenChannel(BIDSfieldLibrary):
             raise IndexError("sequence (" + str(sequence) 
                              + ")is out of the range")
 
-        time = self._getTime(point, self._seqStartTime[sequence], 1) 
-        index = (time - StartTime).total_seconds()\
-            / (self._frequency * freqMultiplier)
-        return round(index)
+        ticks = self._toTicks(self._seqStartTime[sequence], StartTime)
+        return self._roundDiv((ticks * self._frequency 
+                               + point * self._TICKS) * freqMultiplier,
+                              self._TICKS)
 
     def GetLocalindex(self, point, StartTime=None, freqMultiplier=None):
         """
@@ -580,6 +671,24 @@ class GenChannel(BIDSfieldLibrary):
             raise TypeError("time must be datetime object")
         return self._getLocalIndex(time)
 
+    def GetLocalIndicesFromTime(self, times):
+        """
+        Converts array of times to local indices. If time is before 
+        the first sequence, returned sequence is set to -1.
+        If there no data point at given time, returned index
+        will be set to -1
+
+        Parameters
+        ----------
+        times : list(datetime) or numpy.ndarray(datetime64)
+
+        Returns
+        -------
+        (numpy.ndarray, numpy.ndarray)
+            arrays of indices and sequences
+        """
+        return self._getLocalIndices(times)
+
     def GetGlobalIndexFromTime(self, time, 
                                StartTime=None, freqMultiplier=None):
         """
@@ -609,8 +718,9 @@ class GenChannel(BIDSfieldLibrary):
             raise TypeError("StartTime must be datetime")
         if not isinstance(freqMultiplier, int):
             raise TypeError("freqMultiplier must be int")
-        dt = (time - StartTime).total_seconds()
-        return round(dt * self._frequency * freqMultiplier)
+        return self._roundDiv(self._toTicks(time, StartTime) 
+                              * self._frequency * freqMultiplier,
+                              self._TICKS)
 
     def GetValue(self, point, default=0, 
                  sequence=None, StartTime=None, 
@@ -699,7 +809,9 @@ class GenChannel(BIDSfieldLibrary):
         # point by timedelta
         elif isinstance(point, timedelta):
             if sequence is not None:
-                point = round(point.total_seconds() * self._frequency)
+                point = self._roundDiv(
+                        (point // self._TICK) * self._frequency, 
+                        self._TICKS)
                 if point > self.GetSequenceSize(sequence):
                     point = -1
             else:
@@ -712,8 +824,7 @@ class GenChannel(BIDSfieldLibrary):
                 if point > self.GetSequenceSize(sequence):
                     point = -1
             else:
-                point = self._startTime + timedelta(seconds=point
-                                                    / self._frequency)
+                point = self._startTime + self._getDeltaTime(point, 1)
                 point, sequence = self._getLocalIndex(point)
 
         if point < 0 or sequence < 0:
@@ -725,6 +836,111 @@ class GenChannel(BIDSfieldLibrary):
         else:
             return self._fromRaw(value)
 
+    def GetValues(self, points, default=0, StartTime=None, 
+                  raw=False, dtype=None):
+        """
+        Batched version of GetValue. Retrieves values of several 
+        points. Points are grouped by sequence and each group is
+        retrieved with a single read.
+
+        If given hannel is a copy of an original channel, the values 
+        are retrieved from the original one.
+
+        Parameters
+        ----------
+        points : array_like(int)
+            global indices of points to be retrieved
+        points : array_like(datetime or datetime64)
+            times of points to be retrieved
+        points : array_like(timedelta or timedelta64)
+            times of points passed from StartTime
+        default : int, 0
+            value for points not available, e.g. not in sequence
+        StartTime : datetime, optional
+            reference time for indices and timedeltas.
+            If set to None, the channel-defined value is used.
+        raw : bool, False
+            If set to true, the raw, unscaled values are retrieved
+        dtype : numpy.dtype, None
+            type of returned array, if None, int64 is used for raw
+            values and float64 for scaled ones
+
+        Returns
+        -------
+        numpy.ndarray
+            the values of required points
+
+        Raises
+        ------
+        TypeError
+            if given parameters are of wrong type
+        NotImplementedError
+            if class do not implements data retrieval in 
+            _getValueVector function
+        """
+        if self._baseChannel != self:
+            return self._baseChannel.GetValues(points, default,
+                                               StartTime, raw, dtype)
+        if StartTime is None:
+            StartTime = self._startTime
+        if not isinstance(StartTime, datetime):
+            raise TypeError("StartTime must be datetime")
+        if not isinstance(raw, bool):
+            raise TypeError("raw must be a bool")
+        if dtype is None:
+            if raw:
+                dtype = numpy.int64
+            else:
+                dtype = numpy.float64
+
+        points = numpy.asarray(points)
+        if points.dtype.kind == "O" and points.size > 0:
+            if isinstance(points.flat[0], datetime):
+                points = points.astype("datetime64[us]")
+            elif isinstance(points.flat[0], timedelta):
+                points = points.astype("timedelta64[us]")
+        ref = numpy.datetime64(StartTime, "us")
+        if points.dtype.kind in "iu":
+            times = ref + self._roundDiv(points.astype(numpy.int64) 
+                                         * self._TICKS,
+                                         self._frequency)\
+                .astype("timedelta64[us]")
+        elif points.dtype.kind == "M":
+            times = points
+        elif points.dtype.kind == "m":
+            times = ref + points.astype("timedelta64[us]")
+        elif points.size == 0:
+            times = numpy.empty(points.shape, dtype="datetime64[us]")
+        else:
+            raise TypeError("points must be either int, datetime "
+                            "or timedelta")
+
+        res = numpy.full(points.shape, default, dtype=dtype)
+        ind, seq = self._getLocalIndices(times)
+        valid = (ind >= 0) & (seq >= 0)
+        if raw:
+            wtype = numpy.int64
+        else:
+            wtype = numpy.float64
+        for s in numpy.unique(seq[valid]):
+            mask = valid & (seq == s)
+            idx = ind[mask]
+            first = int(idx.min())
+            span = int(idx.max()) - first + 1
+            if span <= max(self._MAXGAP, 64 * len(idx)):
+                data = numpy.asarray(
+                        self._getValueVector(first, span, int(s)),
+                        dtype=wtype)[idx - first]
+            else:
+                # Points are too sparse to be read in one block
+                data = numpy.array([self._getValue(int(i), int(s))
+                                    for i in idx], dtype=wtype)
+            data = numpy.clip(data, self._digMin, self._digMax)
+            if not raw:
+                data = self._fromRaw(data)
+            res[mask] = data
+        return res
+
     def GetValueVector(self, timeStart, timeEnd, 
                        default=0, freq_mult=None, raw=False):
         """
@@ -740,7 +956,7 @@ class GenChannel(BIDSfieldLibrary):
         All values that are output data sequences are filled with 
         default value.
 
-        This functions calls _getValueVector virtual function
+        This is a list-returning wrapper around GetBlock
 
         Parameters
         ----------
@@ -759,6 +975,66 @@ class GenChannel(BIDSfieldLibrary):
         raw : bool, False
             If set to true, the retrieved values will be unscaled
 
+        Returns
+        -------
+        list
+            retrieved values
+
+        Raises
+        ------
+        TypeError
+            if passed parameters are of wrong type
+        ValueError
+            if timeStart is greater than stopTime
+        NotImplemented
+            if _getValueVector is not implemented for used format
+        """
+        return self.GetBlock(timeStart, timeEnd, 
+                             default, freq_mult, raw).tolist()
+
+    def GetBlock(self, timeStart, timeEnd, 
+                 default=0, freq_mult=None, raw=False, dtype=None):
+        """
+        Reads and returns datapoints in range [timeStart, timeEnd[
+        as numpy array. The data point coresponding to timeEnd is 
+        not retrieved to avoid overlaps in sequential reading. 
+        If timeEnd - timeStart < 1/frequency no data will be readed.
+
+        If given hannel is a copy of an original channel, the values 
+        are retrieved from the original one. In such case the sequences 
+        and start times are also treated by original channel.
+
+        All values that are output data sequences are filled with 
+        default value.
+
+        This functions calls _getValueVector virtual function
+
+        Parameters
+        ----------
+        timeStart : datetime
+            Start time point for reading data
+        timeEnd : datetime
+            End time point for reading data. Must be equal or bigger than
+            timeStart. Data point at timeEnd is not retrieved.
+        timeEnd : timedelta or float
+            time range (in seconds if float) from startTime to be read. 
+            Must be positive.
+        default : float, 0
+            default value for result, if data fals out of sequences
+        freq_mult : int, None
+            If set, resulting array will be oversampled by this value.
+            Each additional cells will be filled with preceeding value
+        raw : bool, False
+            If set to true, the retrieved values will be unscaled
+        dtype : numpy.dtype, None
+            type of returned array, if None, int64 is used for raw
+            values and float64 for scaled ones
+
+        Returns
+        -------
+        numpy.ndarray
+            retrieved values
+
         Raises
         ------
         TypeError
@@ -769,12 +1045,11 @@ class GenChannel(BIDSfieldLibrary):
             if _getValueVector is not implemented for used format
         """
         if self._baseChannel != self:
-            return self._baseChannel.GetValueVector(timeStart, timeEnd,
-                                                    default, freq_mult, raw)
+            return self._baseChannel.GetBlock(timeStart, timeEnd,
+                                              default, freq_mult, raw, dtype)
         if not (isinstance(timeStart, datetime)):
             raise TypeError("timeStart must be datetime")
-        if not (isinstance(timeEnd, datetime)
-                or isinstance(timeEnd, timedelta, float)):
+        if not isinstance(timeEnd, (datetime, timedelta, float)):
             raise TypeError("timeEnd must be either "
                             "datetime, timedelta or float")
         if freq_mult is None:
@@ -783,19 +1058,24 @@ class GenChannel(BIDSfieldLibrary):
             raise TypeError("freq_mult must be int")
         if not (isinstance(raw, bool)):
             raise TypeError("raw must be boolean")
+        if dtype is None:
+            if raw:
+                dtype = numpy.int64
+            else:
+                dtype = numpy.float64
 
-        dt = timeEnd
-        if isinstance(dt, datetime):
-            dt = (dt - timeStart).total_seconds()
-        elif isinstance(dt, timedelta):
-            timeEnd = timeStart + dt
-            dt = dt.total_seconds()
+        if isinstance(timeEnd, float):
+            timeEnd = timedelta(seconds=timeEnd)
+        if isinstance(timeEnd, timedelta):
+            timeEnd = timeStart + timeEnd
+        dt = self._toTicks(timeEnd, timeStart)
         if dt < 0:
             raise ValueError("time span must be positif")
 
         # total size of data to retrieve
-        points = int(dt * self._frequency)
-        res = [default] * int(dt * self._frequency * freq_mult)
+        points = dt * self._frequency // self._TICKS
+        res = numpy.full(dt * self._frequency * freq_mult // self._TICKS, 
+                         default, dtype=dtype)
         seq = -1
 
         for seq_start, seq_size, seq_time\
@@ -804,8 +1084,8 @@ class GenChannel(BIDSfieldLibrary):
             # Sequance starts after end time
             if seq_time >= timeEnd: break
             # offset of sequance start relative to start time
-            offset = round((timeStart - seq_time).total_seconds()
-                           * self._frequency)
+            offset = self._roundDiv(self._toTicks(timeStart, seq_time)
+                                    * self._frequency, self._TICKS)
 
             # Sequence ends before time start
             if (offset) >= seq_size:
@@ -832,27 +1112,185 @@ class GenChannel(BIDSfieldLibrary):
                 if offset * freq_mult > len(res): break
                 to_read = min(seq_size, points - offset)
                 index = offset * freq_mult
+            if to_read <= 0:
+                continue
 
             d = self._getValueVector(read_start, to_read, seq)
             if len(d) != to_read:
                 raise Exception("Sequence {}: readed {} points, "
                                 "{} expected".format(
                                     seq, len(d), to_read))
-            for i in range(0, to_read):
-                # res[index] = struct.unpack(self.Endian\
-                #              + self._Marks[b'\x20\x00\x00\x00'].Format,
-                #              data[i:i+self._dataSize])[0]
-                res[index] = d[i]
-                if res[index] > self._digMax: res[index] = self._digMax
-                if res[index] < self._digMin: res[index] = self._digMin
-                if not raw:
-                    res[index] = self._fromRaw(res[index])
-                # filling the interpoint space with previous value
-                for j in range(index + 1, index + freq_mult):
-                    res[j] = res[index]
-                index += freq_mult
+            if raw:
+                d = self._clipRaw(d)
+            else:
+                d = self._fromRaw(numpy.clip(numpy.asarray(d, 
+                                                           numpy.float64),
+                                             self._digMin, self._digMax))
+            # filling the interpoint space with previous value
+            if freq_mult > 1:
+                d = numpy.repeat(d, freq_mult)
+            res[index:index + len(d)] = d
+        return res
+
+    def GetResampledBlock(self, timeStart, timeEnd, frequency,
+                          default=0, raw=False, dtype=None):
+        """
+        Reads and returns datapoints in range [timeStart, timeEnd[
+        resampled to given frequency, as numpy array. 
+
+        The data is passed through an anti-aliasing polyphase
+        resampler, using the true sampling frequency of channel,
+        so the drift of acquisition clock is corrected. Input points 
+        are filtered within their sequence, and output points 
+        outside sequences are filled with default value.
+
+        The last read input points are kept with resampler, 
+        so reading consecutive time ranges accesses each input
+        point only once. If channel frequency and true frequency
+        are equal to output one, this is equivalent to GetBlock.
+
+        Parameters
+        ----------
+        timeStart : datetime
+            Start time point for reading data
+        timeEnd : datetime, timedelta or float
+            End time point or time range (in seconds if float),
+            data point at timeEnd is not retrieved
+        frequency : int
+            output sampling frequency
+        default : float, 0
+            default value for result, if data fals out of sequences
+        raw : bool, False
+            If set to true, the retrieved values will be unscaled
+            and rounded to integers
+        dtype : numpy.dtype, None
+            type of returned array, if None, int64 is used for raw
+            values and float64 for scaled ones
+
+        Returns
+        -------
+        numpy.ndarray
+            retrieved values
+
+        Raises
+        ------
+        TypeError
+            if passed parameters are of wrong type
+        ValueError
+            if timeStart is greater than stopTime
+        """
+        if self._baseChannel != self:
+            return self._baseChannel.GetResampledBlock(
+                    timeStart, timeEnd, frequency, default, raw, dtype)
+        if not isinstance(frequency, int):
+            raise TypeError("frequency must be int")
+        rate = self.GetTrueFrequency()
+        if frequency == self._frequency and rate == self._frequency:
+            return self.GetBlock(timeStart, timeEnd, default=default,
+                                 freq_mult=1, raw=raw, dtype=dtype)
+        if not (isinstance(timeStart, datetime)):
+            raise TypeError("timeStart must be datetime")
+        if not isinstance(timeEnd, (datetime, timedelta, float)):
+            raise TypeError("timeEnd must be either "
+                            "datetime, timedelta or float")
+        if dtype is None:
+            if raw:
+                dtype = numpy.int64
+            else:
+                dtype = numpy.float64
+
+        if isinstance(timeEnd, float):
+            timeEnd = timedelta(seconds=timeEnd)
+        if isinstance(timeEnd, timedelta):
+            timeEnd = timeStart + timeEnd
+        dt = self._toTicks(timeEnd, timeStart)
+        if dt < 0:
+            raise ValueError("time span must be positif")
+
+        if self._resampling is None\
+                or self._resampling[0].OutFrequency != frequency\
+                or self._resampling[0].InFrequency != rate:
+            # resampler, sequence, first index and input points
+            self._resampling = [Resampler(rate, frequency), -1, 0, None]
+        resampler = self._resampling[0]
+        margin = resampler.GetMargin()
+        step = resampler.GetRatio()
+
+        res = numpy.full(dt * frequency // self._TICKS, default, dtype=dtype)
+        for seq, (seq_size, seq_time)\
+                in enumerate(zip(self._seqSize, self._seqStartTime)):
+            if seq_time >= timeEnd: break
+            # position of first output point in sequence input points
+            x0 = self._toTicks(timeStart, seq_time) * rate / self._TICKS
+            # output points nearest to one of sequence points 
+            first = min(max(0, math.ceil((-0.5 - x0) / step)), len(res))
+            last = min(max(0, math.ceil((seq_size - 0.5 - x0) / step)),
+                       len(res))
+            if last <= first:
+                continue
+            positions = x0 + step * numpy.arange(first, last)
+            lo = max(0, int(math.floor(positions[0])) - margin)
+            hi = min(seq_size, int(math.floor(positions[-1])) + margin + 1)
+            data = self._readResamplingInput(seq, lo, hi)
+            d = resampler.Interpolate(data, lo, positions)
+            if raw:
+                d = self._clipRaw(numpy.rint(d).astype(numpy.int64))
+            else:
+                d = self._fromRaw(d)
+            res[first:last] = d
         return res
 
+    def _readResamplingInput(self, seq, lo, hi):
+        """
+        Retrieves input points [lo, hi[ of sequence, clipped to
+        digital range, reusing points read by previous call
+        """
+        state = self._resampling
+        data = None
+        if state[1] == seq and state[3] is not None:
+            first, kept = state[2], state[3]
+            if first <= lo < first + len(kept):
+                data = kept[lo - first:hi - first]
+        if data is None:
+            data = numpy.empty(0, dtype=numpy.float64)
+        if lo + len(data) < hi:
+            new = self._getValueVector(lo + len(data), 
+                                       hi - lo - len(data), seq)
+            if len(new) != hi - lo - len(data):
+                raise Exception("Sequence {}: readed {} points, "
+                                "{} expected".format(
+                                    seq, len(new), hi - lo - len(data)))
+            new = numpy.clip(numpy.asarray(new, numpy.float64),
+                             self._digMin, self._digMax)
+            data = numpy.concatenate((data, new))
+        state[1], state[2], state[3] = seq, lo, data
+        return data
+
+    def _clipRaw(self, data):
+        """
+        Clips raw data to the digital range. If data type fits
+        in digital range, data is returned unchanged, so samples 
+        can be copied without decoding to output of the same type.
+
+        Parameters
+        ----------
+        data : array_like
+            raw data
+
+        Returns
+        -------
+        numpy.ndarray
+        """
+        data = numpy.asarray(data)
+        if data.dtype.kind not in "iu":
+            return numpy.clip(data.astype(numpy.int64),
+                              self._digMin, self._digMax)
+        info = numpy.iinfo(data.dtype)
+        if self._digMin <= info.min and self._digMax >= info.max:
+            return data
+        return numpy.clip(data, max(self._digMin, info.min), 
+                          min(self._digMax, info.max))
+
     def _getLocalIndex(self, time):
         """
         Retrieves point index and sequence for a given time. If there 
@@ -875,18 +1313,116 @@ class GenChannel(BIDSfieldLibrary):
         """
         ind = -1
         seq = -1
-        for t in self._seqStartTime:
-            if round((time - t).total_seconds()
-                     * self._frequency) < 0:
-                break
-            seq += 1
+        if len(self._seqStartTime) == 0:
+            return (ind, seq)
+        starts = self._getSeqOffsets()[0]
+        q = self._toTicks(time, self._seqStartTime[0])
+        # Time belongs to the sequence if it is not earlier 
+        # than half a point before its start
+        seq = bisect.bisect_right(starts, q + self._TICKS 
+                                  // (2 * self._frequency)) - 1
         if seq >= 0:
-            ind = round((time - self.GetSequenceStart(seq)).total_seconds()
-                        * self._frequency)
+            ind = self._roundDiv((q - starts[seq]) * self._frequency,
+                                 self._TICKS)
             if ind >= self.GetSequenceSize(seq):
                 ind = -1
         return (ind, seq)
 
+    def _getSeqOffsets(self):
+        """
+        Retrieves the start times of sequences, in ticks
+        from the start of first sequence. Offsets are recalculated
+        if list of sequences was replaced or changed its size
+
+        Returns
+        -------
+        (list(int), numpy.ndarray)
+            the offsets as list (for bisect) and as array
+        """
+        if self._seqIndex is None\
+                or self._seqIndex[0] is not self._seqStartTime\
+                or len(self._seqIndex[1]) != len(self._seqStartTime):
+            starts = [self._toTicks(t, self._seqStartTime[0]) 
+                      for t in self._seqStartTime]
+            self._seqIndex = (self._seqStartTime, starts, 
+                              numpy.array(starts, dtype=numpy.int64))
+        return self._seqIndex[1:]
+
+    def _getLocalIndices(self, times):
+        """
+        Batched version of _getLocalIndex. Retrieves point indices 
+        and sequences for given times. If there no corresponding index 
+        and/or sequence, will return -1 as corresponding value.
+
+        Do not checks for types
+
+        Parameters
+        ----------
+        times : numpy.ndarray
+            array of datetime64 
+
+        Returns
+        -------
+        (numpy.ndarray, numpy.ndarray)
+            arrays of points and sequences, see _getLocalIndex
+        """
+        times = numpy.asarray(times, dtype="datetime64[us]")
+        ind = numpy.full(times.shape, -1, dtype=numpy.int64)
+        seq = numpy.full(times.shape, -1, dtype=numpy.int64)
+        if len(self._seqStartTime) == 0:
+            return (ind, seq)
+        starts = self._getSeqOffsets()[1]
+        sizes = numpy.array(self._seqSize, dtype=numpy.int64)
+        q = (times - numpy.datetime64(self._seqStartTime[0], "us"))\
+            .astype(numpy.int64)
+
+        seq = numpy.searchsorted(starts, q + self._TICKS 
+                                 // (2 * self._frequency),
+                                 side="right") - 1
+        valid = seq >= 0
+        cur = numpy.maximum(seq, 0)
+        ind = self._roundDiv((q - starts[cur]) * self._frequency, 
+                             self._TICKS)
+        ind[~valid | (ind >= sizes[cur])] = -1
+        return (ind, seq)
+
+    @staticmethod
+    def _roundDiv(num, den):
+        """
+        Integer division rounded to the nearest integer, with ties 
+        rounded to even, as builtin round. Works also with numpy 
+        integer arrays.
+
+        Parameters
+        ----------
+        num : int or numpy.ndarray
+            numerator
+        den : int
+            positive denominator
+
+        Returns
+        -------
+        int or numpy.ndarray
+        """
+        q, r = divmod(num, den)
+        return q + ((2 * r > den) | ((2 * r == den) & (q % 2 == 1)))
+
+    def _toTicks(self, time, reference):
+        """
+        Converts time to number of ticks passed since reference
+        Do not check for parameters validity.
+
+        Parameters
+        ----------
+        time : datetime
+        reference : datetime
+
+        Returns
+        -------
+        int
+        """
+        return (time - reference) // self._TICK
+
     def _getTime(self, point, StartTime, freqMultiplier):
         """
         Retrieves time corresponding to a index given starting time 
@@ -931,7 +1467,8 @@ class GenChannel(BIDSfieldLibrary):
         timedelta
             time passed since start
         """
-        return timedelta(seconds=point / (self._frequency * freqMultiplier))
+        return timedelta(microseconds=self._roundDiv(
+            point * self._TICKS, self._frequency * freqMultiplier))
 
     def _getValue(self, point, sequence):
         """
@@ -986,8 +1523,8 @@ class GenChannel(BIDSfieldLibrary):
 
         Returns
         -------
-        list(int)
-            a list of readed data
+        numpy.ndarray
+            an array of readed data
 
         Raises
         ------
@@ -0,0 +1,188 @@
+#############################################################################
+## EventTable provides a columnar index of events
+#############################################################################
+## Copyright (c) 2018-2019, University of Liège
+## Author: Nikita Beliy
+## Owner: Liege University https://www.uliege.be
+## Version: 0.77r5
+## Maintainer: Nikita Beliy
+## Email: Nikita.Beliy@uliege.be
+## Status: developpement
+#############################################################################
+## This file is part of eegBidsCreator
+## eegBidsCreator is free software: you can redistribute it and/or modify
+## it under the terms of the GNU General Public License as published by
+## the Free Software Foundation, either version 2 of the License, or
+## (at your option) any later version.
+## eegBidsCreator is distributed in the hope that it will be useful,
+## but WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+## GNU General Public License for more details.
+## You should have received a copy of the GNU General Public License
+## along with eegBidsCreator.  If not, see <https://www.gnu.org/licenses/>.
+############################################################################
+
+from datetime import datetime
+from datetime import timedelta
+
+import numpy
+
+
+class EventTable(object):
+    """
+    Columnar index of events, used for searches. Each event is defined
+    by its onset, counted in integer microsecond ticks since 1970-01-01,
+    its duration and the code of its name, names being stored once in
+    a categories list.
+
+    Columns are retrieved sorted by onset, name and duration, as
+    GenEvent are ordered, events with same key keeping their order
+    of addition. The table is built from a sorted list of events,
+    positions in table are then the same as in the list.
+    """
+    __slots__ = ["__ticks", "__durations", "__codes",
+                 "__names", "__nameIndex",
+                 "__sorted", "__positions"]
+
+    _EPOCH = datetime(1970, 1, 1)
+    _TICK = timedelta(microseconds=1)
+
+    def __init__(self):
+        self.__ticks = list()
+        self.__durations = list()
+        self.__codes = list()
+        self.__names = list()
+        self.__nameIndex = dict()
+        self.__sorted = None
+        self.__positions = None
+
+    def __len__(self):
+        return len(self.__ticks)
+
+    @classmethod
+    def TimeToTicks(cls, time):
+        """Converts datetime to ticks"""
+        return (time - cls._EPOCH) // cls._TICK
+
+    @classmethod
+    def TicksToTime(cls, ticks):
+        """Converts ticks to datetime"""
+        return cls._EPOCH + timedelta(microseconds=int(ticks))
+
+    def __nameCode(self, name):
+        code = self.__nameIndex.get(name)
+        if code is None:
+            code = len(self.__names)
+            self.__names.append(name)
+            self.__nameIndex[name] = code
+        return code
+
+    def Append(self, ticks, durations, names):
+        """
+        Adds a set of events to the table
+
+        Parameters
+        ----------
+        ticks : array_like(int)
+            onsets of events in ticks
+        durations : array_like(float)
+            durations of events in seconds
+        names : list(str)
+            names of events
+        """
+        self.__ticks.extend(numpy.asarray(ticks, dtype=numpy.int64).tolist())
+        self.__durations.extend(numpy.asarray(durations,
+                                              dtype=numpy.float64).tolist())
+        self.__codes.extend(self.__nameCode(name) for name in names)
+        self.__sorted = None
+        self.__positions = None
+
+    def __sort(self):
+        """
+        Computes and caches sorted columns:
+        (ticks, durations, codes)
+        """
+        if self.__sorted is None:
+            ticks = numpy.array(self.__ticks, dtype=numpy.int64)
+            durations = numpy.array(self.__durations, dtype=numpy.float64)
+            codes = numpy.array(self.__codes, dtype=numpy.int64)
+            rank = numpy.empty(len(self.__names), dtype=numpy.int64)
+            rank[sorted(range(len(self.__names)),
+                        key=self.__names.__getitem__)]\
+                = numpy.arange(len(self.__names))
+            order = numpy.lexsort((durations, rank[codes], ticks))
+            self.__sorted = (ticks[order], durations[order], codes[order])
+        return self.__sorted
+
+    def GetOnsets(self):
+        """Returns onsets of events in ticks"""
+        return self.__sort()[0]
+
+    def GetDurations(self):
+        """Returns durations of events in seconds"""
+        return self.__sort()[1]
+
+    def GetNameCodes(self):
+        """Returns codes of names of events"""
+        return self.__sort()[2]
+
+    def GetNames(self):
+        """Returns the list of names, indexed by name codes"""
+        return self.__names
+    def GetPositions(self, name):
+        """
+        Returns the sorted indices of events with given name.
+        Indices of all names are computed at once and kept until
+        the table is modified.
+
+        Parameters
+        ----------
+        name : str
+            name of events
+
+        Returns
+        -------
+        numpy.ndarray(int)
+        """
+        if self.__positions is None:
+            codes = self.GetNameCodes()
+            order = numpy.argsort(codes, kind="stable")
+            bounds = numpy.searchsorted(codes[order],
+                                        numpy.arange(len(self.__names) + 1))
+            self.__positions = {n: order[bounds[c]:bounds[c + 1]]
+                                for c, n in enumerate(self.__names)}
+        return self.__positions.get(name, numpy.empty(0, dtype=numpy.int64))
+
+    def GetTime(self, index):
+        """Returns the onset of index-th event as datetime"""
+        return self.TicksToTime(self.GetOnsets()[index])
+
+    def GetName(self, index):
+        """Returns the name of index-th event"""
+        return self.__names[self.GetNameCodes()[index]]
+
+    def GetRange(self, t_low=None, t_high=None):
+        """
+        Returns the range of indices of events with onset
+        between t_low and t_high (inclusive)
+
+        Parameters
+        ----------
+        t_low, t_high : datetime, optional
+            time limits, if None, range is not limited
+
+        Returns
+        -------
+        (int, int)
+            first index and index after last event
+        """
+        onsets = self.GetOnsets()
+        start = 0
+        stop = len(onsets)
+        if t_low is not None:
+            start = int(numpy.searchsorted(onsets, self.TimeToTicks(t_low),
+                                           side="left"))
+        if t_high is not None:
+            stop = int(numpy.searchsorted(onsets, self.TimeToTicks(t_high),
+                                          side="right"))
+        return start, max(start, stop)
@@ -29,13 +29,16 @@ from datetime import timedelta
 import glob
 import os
 import logging
-import bisect
+import heapq
 import json
 
+import numpy
+
 from tools import exceptions as error
 
 from DataStructure.Generic.Channel import GenChannel as Channel
 from DataStructure.Generic.Event import GenEvent as Event
+from DataStructure.Generic.EventTable import EventTable
 
 from DataStructure.BIDS.BIDS import BIDSid
 from DataStructure.BIDS.BIDS import BIDSfieldLibrary
@@ -122,7 +125,7 @@ class Record(BIDSid):
                  # Time limits concidered for confertion
                  "__RefTime", "__EndTime",
                  "Channels", "_chDict", "_dropped","_mainChannel",
-                 "Events",
+                 "Events", "_eventIndex",
                  "__Frequency",
                  "__inPath", "__outPath",
                  "_aDate",
@@ -213,6 +216,7 @@ class Record(BIDSid):
         self.Channels = list()
         self._mainChannel = None
         self.Events = list()
+        self._eventIndex = None
         self._chDict = dict()
         self._dropped = list()
         self.__Frequency = 1
@@ -658,6 +662,43 @@ class Record(BIDSid):
         te = min(t_e1, t_e2)
         return (ts, te)
 
+    def GetDataSegments(self, t_low=None, t_high=None, min_gap=timedelta(0)):
+        """
+        Returns the time intervals within [t_low, t_high) where at least
+        one channel has data. Intervals separated by a gap shorter than
+        min_gap are merged.
+
+        Parameters
+        ----------
+        t_low : datetime, optional
+            lower time limit, if None reference time is used
+        t_high : datetime, optional
+            upper time limit, if None end time is used
+        min_gap : timedelta
+            minimal duration of a gap between two intervals
+
+        Returns
+        -------
+        list(tuple(datetime, datetime))
+            sorted list of start and end times of intervals
+        """
+        if t_low is None: t_low = self.__RefTime
+        if t_high is None: t_high = self.__EndTime
+        intervals = sorted((ch.GetSequenceStart(seq), ch.GetSequenceEnd(seq))
+                           for ch in self.Channels
+                           for seq in range(ch.GetNsequences()))
+        segments = list()
+        for t_s, t_e in intervals:
+            t_s, t_e = max(t_s, t_low), min(t_e, t_high)
+            if t_s >= t_e:
+                continue
+            if segments and t_s - segments[-1][1] < min_gap:
+                if t_e > segments[-1][1]:
+                    segments[-1][1] = t_e
+            else:
+                segments.append([t_s, t_e])
+        return [tuple(s) for s in segments]
+
     ###########################
     # Subject and device info #
     ###########################
@@ -739,10 +780,17 @@ class Record(BIDSid):
             self.JSONdata["RecordingDuration"] = round(
                     (self.__EndTime - self.__RefTime).total_seconds(),1)
 
+        self.JSONdata.update(self._countChannels(self.Channels))
+
+    def _countChannels(self, channels):
+        """
+        Returns the number of channels of each type, 
+        as defined in BIDS eeg.json
+        """
         counter = {"EEGChannelCount":0, "EOGChannelCount":0, 
                    "ECGChannelCount":0, "EMGChannelCount":0, 
                    "MiscChannelCount":0}
-        for ch in self.Channels:
+        for ch in channels:
             if "EEG" in ch.SigType:
                 counter["EEGChannelCount"] += 1
             elif "EOG" in ch.SigType:
@@ -753,7 +801,7 @@ class Record(BIDSid):
                 counter["EMGChannelCount"] += 1
             else:
                 counter["MiscChannelCount"] += 1
-        self.JSONdata.update(counter)
+        return counter
 
     def CheckJSON(self):
         diff = [k for k in JSONfields if k not in self.JSONdata]
@@ -763,12 +811,29 @@ class Record(BIDSid):
         res4 = [k for k in self.JSONdata if k not in JSONfields]
         return (res1,res2,res3,res4)
 
-    def DumpJSON(self):
+    def DumpJSON(self, acq=None, channels=None):
+        """
+        Writes eeg.json sidecar file
+
+        Parameters
+        ----------
+        acq : str, optional
+            suffix of acquisition label, passed to GetPrefix
+        channels : list(GenChannel), optional
+            if set, sidecar describes only given channels, sampled 
+            at the highest frequency among them
+        """
         Logger.info("Creating eeg.json file")
+        data = self.JSONdata
+        if channels is not None:
+            data = dict(self.JSONdata)
+            data.update(self._countChannels(channels))
+            data["SamplingFrequency"] = max(ch.GetFrequency() 
+                                            for ch in channels)
         with open(self.Path(appdir="eeg",
-                            appfile=self.GetPrefix() + "_eeg.json"),
+                            appfile=self.GetPrefix(acq=acq) + "_eeg.json"),
                   'w', encoding='utf-8') as f:
-            json.dump(self.JSONdata, f, 
+            json.dump(data, f, 
                       skipkeys=False, indent="  ", 
                       separators=(',',':'))
 
@@ -796,11 +861,69 @@ class Record(BIDSid):
         bidsify : bool
             set to True for force channel types to comply to BIDS
         """
-        channels = self._readChannels(name)
+        probes = None
+        if white_list != [] or black_list != []:
+            probes = self._probeChannels(name)
+        if probes is None:
+            channels = self._readChannels(name)
+        else:
+            # Only selected channels are fully read
+            sources = []
+            for ch_name, source in probes:
+                if self.__isSelected(ch_name, white_list, black_list):
+                    sources.append(source)
+                else:
+                    self._dropped.append(ch_name)
+            channels = self._openChannels(sources)
         for c in channels:
             self.__addChannel(c,white_list, black_list)
         self.InitChannels(bidsify=bidsify)
 
+    def _probeChannels(self, name=None):
+        """
+        virtual function that retrieves names of available channels
+        without reading them. Allows to read only channels passing
+        white and black lists.
+
+        By default returns None, i.e. probing is not supported
+
+        Parameters
+        ----------
+        name : str, optional
+            name of channel to probe, if not set, 
+            probes all available channels
+
+        Returns
+        -------
+        list((str, object)) or None
+            list of channel names and corresponding sources, 
+            that can be passed to _openChannels
+        """
+        return None
+
+    def _openChannels(self, sources):
+        """
+        pure virtual function that reads channels from the sources
+        retrieved by _probeChannels.
+
+        Always raise NotImplementedError
+
+        Parameters
+        ----------
+        sources : list
+            list of channel sources
+
+        Raises
+        ------
+        NotImplementedError
+            if function is not overloaded for given class
+
+        Returns
+        -------
+        list(GenChannel)
+        """
+        raise NotImplementedError
+
     def _readChannels(self, name=None):
         """
         pure virtual function that read given channel form file.
@@ -858,13 +981,15 @@ class Record(BIDSid):
             self.__addChannel(channels, white_list, black_list)
         self.InitChannels(bidsify=bidsify)
 
+    def __isSelected(self, name, white_list=[], black_list=[]):
+        if black_list != [] and (name in black_list): 
+            return False
+        return white_list == [] or (name in white_list)
+
     def __addChannel(self, c, white_list=[], black_list=[]):
         if not isinstance(c, Channel):
             raise TypeError("Variable {} is not of a channel type".format(c))
-        if black_list != [] and (c.GetName() in black_list): 
-            self._dropped.append(c.GetName())
-            return False
-        if white_list == [] or (c.GetName() in white_list):
+        if self.__isSelected(c.GetName(), white_list, black_list):
             self.Channels.append(c)
             Logger.debug("Channel {}, type {}, Sampling {} Hz".format(
                 c.GetName(), c.GetId(), int(c.GetFrequency())))
@@ -958,37 +1083,130 @@ class Record(BIDSid):
     def _readEvents(self):
         raise NotImplemented
 
+    @staticmethod
+    def _eventKey(ev):
+        """Returns the key by which events are sorted and merged"""
+        return (ev.GetTime(), ev.GetName(), ev.GetDuration())
+
+    def GetEventTable(self):
+        """
+        Returns the EventTable indexing Events. The keys of events
+        are compared to the ones used to build the table at each call,
+        if Events were modified (added, removed, renamed or moved
+        events), Events are sorted and the table is rebuilt. Positions
+        of events in table are the same as in Events.
+        """
+        keys = [self._eventKey(ev) for ev in self.Events]
+        if self._eventIndex is None or self._eventIndex[0] != keys:
+            self.Events.sort(key=self._eventKey)
+            keys.sort()
+            table = EventTable()
+            table.Append([EventTable.TimeToTicks(k[0]) for k in keys],
+                         [k[2] for k in keys],
+                         [k[1] for k in keys])
+            self._eventIndex = (keys, table)
+        return self._eventIndex[1]
+
+    def __bisectEvents(self, key, lo=0):
+        """
+        Returns the position of first event in Events with
+        key not less than given one
+        """
+        hi = len(self.Events)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._eventKey(self.Events[mid]) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
     def AddEvents(self, events, white_list=[], black_list=[]):
-        if isinstance(events, list):
-            for ev in events:
-                self.__addEvent(ev, white_list, black_list)
-        else:
-            self.__addEvent(events, white_list, black_list)
+        """
+        adds events to sorted Events. Channels of events are restricted
+        to the ones in the list of channels, events referring only to
+        unknown channels are ignored. Events equal to already present
+        ones are merged with them.
 
-    def __addEvent(self, ev, white_list=[], black_list=[]):
-        if not isinstance(ev, Event):
-            raise TypeError("Variable {} is not of a event type".format(ev))
-        if black_list != [] and ev.GetName() in black_list:
+        Few events are inserted by binary search, larger sets are
+        merged with Events in one pass.
+
+        Parameters
+        ----------
+        events : GenEvent or list(GenEvent)
+            events to add
+        white_list : list(str)
+            list of events names to concider
+        black_list : list(str)
+            list of events names to ignore
+        """
+        if not isinstance(events, list):
+            events = [events]
+        new = self.__selectEvents(events, white_list, black_list)
+        new.sort(key=self._eventKey)
+
+        if len(new) * 32 < len(self.Events):
+            pos = 0
+            for ev in new:
+                key = self._eventKey(ev)
+                pos = self.__bisectEvents(key, pos)
+                if pos < len(self.Events)\
+                        and self._eventKey(self.Events[pos]) == key:
+                    self.Events[pos].AddChannel(ev.GetChannels())
+                else:
+                    self.Events.insert(pos, ev)
+                    Logger.debug("Event {}, at {}".format(
+                        ev.GetName(), ev.GetTime().isoformat()))
             return
-        if white_list == [] or (ev.GetName() in white_list):
+
+        # Tags 0 and 1 keep existing events before added ones,
+        # indexes prevent comparison of events
+        old = ((self._eventKey(ev), 0, i, ev)
+               for i, ev in enumerate(self.Events))
+        add = ((self._eventKey(ev), 1, i, ev)
+               for i, ev in enumerate(new))
+        merged = list()
+        last = None
+        for key, added, _, ev in heapq.merge(old, add):
+            if added and key == last:
+                merged[-1].AddChannel(ev.GetChannels())
+                continue
+            merged.append(ev)
+            last = key
+            if added:
+                Logger.debug("Event {}, at {}".format(
+                    ev.GetName(), ev.GetTime().isoformat()))
+        self.Events[:] = merged
+
+    def __selectEvents(self, events, white_list, black_list):
+        """
+        Filters a list of GenEvent by name and restricts their
+        channels to the ones in the list of channels
+        """
+        white = set(white_list)
+        black = set(black_list)
+        dropped = set(self._dropped)
+        res = list()
+        for ev in events:
+            if not isinstance(ev, Event):
+                raise TypeError("Variable {} is not of a event type"
+                                .format(ev))
+            if ev.GetName() in black:
+                continue
+            if white and ev.GetName() not in white:
+                continue
             c_list = [c_id for c_id in ev.GetChannels()
                       if c_id in self._chDict]
-            c_drop = [c_id for c_id in ev.GetChannels()
-                      if c_id in self._dropped]
             if c_list != []:
                 ev.RemoveChannel()
                 ev.AddChannel(c_list)
-            elif c_drop == []:
+            elif not any(c_id in dropped for c_id in ev.GetChannels()):
                 Logger.warning("In Event {}, channels {} are "
                                "not in the list of channels"
                                .format(ev.GetName(), ev.GetChannels()))
-                return
-            if ev not in self.Events:
-                bisect.insort(self.Events, ev)
-                Logger.debug("Event {}, at {}".format(
-                    ev.GetName(), ev.GetTime().isoformat()))
-            else:
-                self.Events[self.Events.index(ev)].AddChannel(ev.GetChannels())
+                continue
+            res.append(ev)
+        return res
 
     def EventsInTime(self, t_low=None, t_high=None):
         if t_low == datetime.min or t_low == datetime.max: t_low = None
@@ -997,8 +1215,8 @@ class Record(BIDSid):
         if not t_low : t_low = self.__RefTime
         if not t_high: t_high = self.__EndTime
 
-        return [ev for ev in self.Events
-                if (ev.GetTime() >= t_low and ev.GetTime() <= t_high)]
+        start, stop = self.GetEventTable().GetRange(t_low, t_high)
+        return self.Events[start:stop]
 
     def SearchEvent(self, event, pos=0, MinTime=None):
         """
@@ -1032,16 +1250,16 @@ class Record(BIDSid):
             raise TypeError("pos must be an int")
         if MinTime is not None and not isinstance(MinTime, datetime):
             raise TypeError("minTime must be a datetime")
-        if pos < 0 : pos += len(self.Events)
-        if pos < 0 or pos >= len(self.Events) : return None
-
-        for i in range(pos, len(self.Events)):
-            if MinTime is not None:
-                if self.Events[i].GetTime() < MinTime:
-                    continue
-            if self.Events[i].GetName() == event:
-                return i
-
+        events = self.GetEventTable()
+        if pos < 0 : pos += len(events)
+        if pos < 0 or pos >= len(events) : return None
+
+        if MinTime is not None:
+            pos = max(pos, events.GetRange(t_low=MinTime)[0])
+        positions = events.GetPositions(event)
+        k = numpy.searchsorted(positions, pos, side="left")
+        if k < len(positions):
+            return int(positions[k])
         return None
 
     def RSearchEvent(self, event, pos=-1, MinTime=None):
@@ -1076,16 +1294,16 @@ class Record(BIDSid):
             raise TypeError("pos must be an int")
         if MinTime is not None and not isinstance(MinTime, datetime):
             raise TypeError("minTime must be a datetime")
-        if pos < 0 : pos += len(self.Events)
-        if pos < 0 or pos >= len(self.Events) : return None
-
-        for i in range(pos, -1, -1):
-            if MinTime is not None:
-                if self.Events[i].GetTime() > MinTime:
-                    continue
-            if self.Events[i].GetName() == event:
-                return i
-
+        events = self.GetEventTable()
+        if pos < 0 : pos += len(events)
+        if pos < 0 or pos >= len(events) : return None
+
+        if MinTime is not None:
+            pos = min(pos, events.GetRange(t_high=MinTime)[1] - 1)
+        positions = events.GetPositions(event)
+        k = numpy.searchsorted(positions, pos, side="right")
+        if k > 0:
+            return int(positions[k - 1])
         return None
 
     def SearchEventByTime(self, MinTime):
@@ -1110,8 +1328,9 @@ class Record(BIDSid):
         """
         if MinTime is not None and not isinstance(MinTime, datetime):
             raise TypeError("MinTime must be a datetime")
-        for i, ev in enumerate(self.Events):
-            if ev.GetTime() >= MinTime: return i
+        events = self.GetEventTable()
+        pos = events.GetRange(t_low=MinTime)[0]
+        if pos < len(events): return pos
         return None
 
     def RSearchEventByTime(self, MaxTime):
@@ -1136,8 +1355,9 @@ class Record(BIDSid):
         """
         if MaxTime is not None and not isinstance(MaxTime, datetime):
             raise TypeError("MaxTime must be a datetime")
-        for i, ev in enumerate(self.Events):
-            if ev.GetTime() <= MaxTime: return i
+        events = self.GetEventTable()
+        pos = events.GetRange(t_high=MaxTime)[1] - 1
+        if pos >= 0: return pos
         return None
 
     def GetRuns(self, openingEvents=[], closingEvents=[], min_span=0):
@@ -1146,7 +1366,7 @@ class Record(BIDSid):
         if openingEvents == [] and closingEvents == []:
             if self._mainChannel is None:
                 raise Exception("Main channel not defined")
-            for i in range(0, self._mainChannelGetNsequences()):
+            for i in range(0, self._mainChannel.GetNsequences()):
                 span = self._mainChannel.GetSequenceDuration(i)
                 if span > min_span:
                     ts, te = self.TimeIntersect(
@@ -1157,41 +1377,46 @@ class Record(BIDSid):
                         res.append([ts,te])
         # Getting runs by event and span
         if openingEvents != [] and closingEvents == []:
+            events = self.GetEventTable()
             for opEv in openingEvents:
-                for ev in self.Events:
-                    if ev.GetName() == opEv:
-                        span = ev.GetDuration() + 1
-                        if span > min_span:
-                            ts, te = self.TimeIntersect(
-                                    ev.GetTime(), 
-                                    ev.GetTime()
-                                    + timedelta(seconds=span))
-                            if te > ts:
-                                res.append([ts,te])
+                for i in events.GetPositions(opEv).tolist():
+                    span = self.Events[i].GetDuration() + 1
+                    if span > min_span:
+                        t = self.Events[i].GetTime()
+                        ts, te = self.TimeIntersect(
+                                t, t + timedelta(seconds=span))
+                        if te > ts:
+                            res.append([ts,te])
         # Getting by opening and closing events
         if openingEvents != [] and closingEvents != []:
+            events = self.GetEventTable()
             for opEv,clEv in zip(openingEvents, closingEvents):
                 l_t = None
                 r_t = None
                 l_c = 0
-                for ev in self.Events:
-                    if ev.GetName() == opEv and l_c == 0:
-                        l_t = ev.GetTime()
+                # Only opening and closing events are visited
+                for i in numpy.union1d(events.GetPositions(opEv),
+                                       events.GetPositions(clEv))\
+                        .tolist():
+                    name = self.Events[i].GetName()
+                    if name == opEv and l_c == 0:
+                        l_t = self.Events[i].GetTime()
                         l_c = 1
-                    elif ev.GetName() == clEv:
+                    elif name == clEv:
                         if l_c == 0:
                             Logger.warning("Extra closing event {} at {}"
-                                           .format(clEv, ev.GetTime()))
+                                           .format(clEv,
+                                                   self.Events[i].GetTime()))
                             break
                         l_c -= 1
                         if l_c == 0:
-                            r_t = ev.GetTime()
+                            r_t = self.Events[i].GetTime()
                             if (r_t - l_t).total_seconds() < min_span:
                                 continue
                             l_t, r_t = self.TimeIntersect(l_t, r_t)
                             if l_t < r_t:
                                 res.append([l_t,r_t])
-                    elif ev.GetName() == opEv:
+                    elif name == opEv:
                         l_c += 1
                 if l_c != 0:
                     Logger.warning("Unclosed event {} at {}".format(opEv, l_t))
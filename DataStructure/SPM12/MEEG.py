@@ -28,7 +28,6 @@ from scipy.io.matlab.mio5_params import MatlabObject
 from datetime import datetime
 import sys
 import numpy
-import struct
 import logging
 
 from numpy.core.records import fromarrays
@@ -36,7 +35,11 @@ from numpy.core.records import fromarrays
 Logger = logging.getLogger(__name__)
 
 class MEEG(object):
-    __slots__ = ["__headerFile", "__dataFile", "__frequency", "__aDate", "__D", "__channels", "__events", "__startTime", "__duration", "__path", "__file"] 
+    __slots__ = ["__headerFile", "__dataFile", "__frequency", "__aDate", "__D", "__channels", "__events", "__startTime", "__duration", "__path", "__file",
+                 "__dataFormat", "__scales", "__nsamples", "__position"] 
+    # SPM12 file_array data types and their codes
+    __dataFormats = {"float32": (numpy.dtype("=f4"), 16),
+                     "int16": (numpy.dtype("=i2"), 4)}
     #SPM12 accepts following types:
     # EOG: EOG, VEOG, HEOG
     # ECG: ECG,EKG
@@ -60,7 +63,34 @@ class MEEG(object):
         self.__D            = dict()
         self.__startTime    = datetime.min
         self.__file = None
-        
+        self.__dataFormat   = "float32"
+        self.__scales       = list()
+        self.__nsamples     = 0
+        self.__position     = 0
+
+    def SetDataFormat(self, dataFormat):
+        """
+        Sets the type of stored data
+
+        Parameters
+        ----------
+        dataFormat : str
+            either float32, storing physical values, or int16, 
+            storing integers scaled per channel
+
+        Raises
+        ------
+        ValueError
+            if dataFormat is not supported
+        """
+        if dataFormat not in self.__dataFormats:
+            raise ValueError(__name__ + ": Data format {} not supported"
+                             .format(dataFormat))
+        self.__dataFormat = dataFormat
+
+    def GetDataFormat(self):
+        return self.__dataFormat
+
     def SetStartTime(self, time):
         self.__startTime = time
         if self.__aDate != None:
@@ -79,11 +109,14 @@ class MEEG(object):
 
     def InitHeader(self, Parameters = None):
         Logger.info("Creating eeg.mat header file")
-        self.__file = open (self.__path+"/"+self.__dataFile, "bw")
+        # Number of points is floored from duration in microseconds,
+        # as for data blocks retrieved from channels
+        self.__nsamples = int(round(self.__duration * 1000000))\
+            * self.__frequency // 1000000
         self.__D = {
             "type":"continuous",
             "data":{},
-            "Nsamples" : float(round(self.__duration*self.__frequency)),
+            "Nsamples" : float(self.__nsamples),
             "Fsample":  float(self.__frequency),
             "timeOnset": float(self.__startTime.microsecond*1e-6),
             "fname":self.__headerFile,
@@ -119,6 +152,28 @@ class MEEG(object):
             spm_type = 'OTHER'
         ch = ( channel.GetName(), 0, spm_type, (), (), channel.GetUnit())   
         self.__channels.append(ch)
+        self.__scales.append(self.__channelScale(channel))
+
+    def __channelScale(self, channel):
+        """
+        Returns the slope and intercept used to store the channel
+        values. If channel digital range fits in int16, the 
+        channel scaling is used, so raw values are stored unchanged, 
+        else the physical range is spread over int16 range.
+        """
+        if self.__dataFormat == "float32":
+            return (1., 0.)
+        info = numpy.iinfo(numpy.int16)
+        dmin, dmax = channel.GetDigMin(), channel.GetDigMax()
+        slope, inter = channel.GetScale(), channel.GetOffset()
+        if dmin >= info.min and dmax <= info.max:
+            return (slope, inter)
+        pmin = dmin * slope + inter
+        pmax = dmax * slope + inter
+        slope = (pmax - pmin) / (info.max - info.min)
+        if slope == 0:
+            slope = 1.
+        return (slope, pmin - info.min * slope)
 
     def WriteChannels(self):
         self.__D['channels'] = numpy.array(self.__channels, 
@@ -138,29 +193,80 @@ class MEEG(object):
                     ('events',object),('tag',object)])
 
     def WriteHeader(self):
+        """
+        Writes the .mat header file and preallocates the .dat file,
+        mapped in memory. Must be called after all channels are 
+        appended.
+        """
+        dtype, code = self.__dataFormats[self.__dataFormat]
+        if self.__dataFormat == "float32":
+            slope, inter = 1., 0.
+        else:
+            # Per-channel scaling, applied along first dimension
+            slope = numpy.array([[s[0]] for s in self.__scales], 
+                                dtype=float)
+            inter = numpy.array([[s[1]] for s in self.__scales],
+                                dtype=float)
         f_data = numpy.array(
                 [(self.__path+self.__dataFile, 
-                [len(self.__channels),int(self.__duration*self.__frequency)],
-                16, 0 if sys.byteorder=='little' else 1, 0, [1.,1.], 1, 0, 'rw')],
+                [len(self.__channels),self.__nsamples],
+                code, 0 if sys.byteorder=='little' else 1, 0, [1.,1.], slope, inter, 'rw')],
             dtype=[('fname', object),('dim', object),('dtype',float),
                 ('be',float), ('offset',float), ('pos', object),
-                ('scl_slope', float), ('scl_inter', float),('permission',object)]
+                ('scl_slope', object), ('scl_inter', object),('permission',object)]
             )
         self.__D['data'] = MatlabObject(f_data, 'file_array')
         savemat(self.__path+self.__headerFile, {'D':self.__D})
-        
-       
-        
+
+        Logger.debug("Preallocating {} samples for {} channels"
+                     .format(self.__nsamples, len(self.__channels)))
+        path = self.__path + "/" + self.__dataFile
+        self.__position = 0
+        if self.__nsamples * len(self.__channels) == 0:
+            open(path, "wb").close()
+            self.__file = None
+        else:
+            # Data is stored as [channels, samples] in Fortran order
+            self.__file = numpy.memmap(path, dtype=dtype, mode="w+",
+                                       shape=(self.__nsamples, 
+                                              len(self.__channels)))
 
     def WriteBlock(self, data):
-        if type(data) != list or type(data[0]) != list:
-            raise Exception("BrainVision: Must have nested list [channels][points]")
+        """
+        Writes the block of data following the previous one.
+        Data exceeding the declared number of samples is ignored.
+
+        Parameters
+        ----------
+        data : list(array_like)
+            physical values of each channel, all of same length
+        """
+        if not isinstance(data, list) or len(data) != len(self.__channels):
+            raise Exception("MEEG: Must have list of {} channels"
+                            .format(len(self.__channels)))
+        size = len(data[0])
         for c in data:
-            if len(c) != len(data[0]):
-                raise Exception("BrainVision: All points list must have same lenght")
-
-        for j in range(0, len(data[0])):
-            d = [0]*len(data)
-            for k in range(0, len(data)):
-                d[k] = data[k][j]
-            self.__file.write(struct.pack('f'*len(data),*d))
+            if len(c) != size:
+                raise Exception("MEEG: All points list must have same lenght")
+        if self.__file is None:
+            return
+        size = min(size, self.__nsamples - self.__position)
+        if size <= 0:
+            return
+        pos = self.__position
+        for k, c in enumerate(data):
+            c = numpy.asarray(c[0:size], dtype=numpy.float64)
+            if self.__dataFormat == "int16":
+                slope, inter = self.__scales[k]
+                c = numpy.clip(numpy.rint((c - inter) / slope),
+                               -32768, 32767)
+            self.__file[pos:pos + size, k] = c
+        self.__position += size
+
+    def Close(self):
+        """
+        Flushes data to disk and closes the .dat file
+        """
+        if self.__file is not None:
+            self.__file.flush()
+            self.__file = None
@@ -42,6 +42,7 @@ class Parcel(object):
                  "__type",     # Type of the container
                  "__version",  # Version of container
                  "__entries",  # List of contents of container
+                 "__index",    # Dictionary of entries lists by name
                  "__start",    # position of the first bit of container
                  "__name",     # Name of the parcel, default est '/'
                  "__parent"    # Parent parcel
@@ -75,9 +76,12 @@ class Parcel(object):
         head = Stream.read(8)
         self.__version, self.__size, self.__type = struct.unpack("<HIH",head)
         self.__entries = []
+        self.__index = dict()
 
         while Stream.tell() < self.__size + self.__start:
-            self.__entries.append(Entry(Stream,Parent=self))
+            en = Entry(Stream,Parent=self)
+            self.__entries.append(en)
+            self.__index.setdefault(en.name(), []).append(en)
 
         if Stream.tell() != self.__size + self.__start:
             raise Exception("Declared size {0} mismatch "
@@ -95,37 +99,31 @@ class Parcel(object):
             p = p.parent()
         return string
 
+    def __lookup(self, title):
+        """Returns the list of entries with given title,
+        or all entries if title is ''"""
+        if title == "":
+            return self.__entries
+        return self.__index.get(title.strip('\0'), [])
+
     def ls(self, title=""):
         """Returns a list of wrappers (entries) in this container,
         matching the given title, if title is '', then full list 
         of wrappers is returned."""
-        res = []
-        for en in self.__entries:
-            if title == ""\
-               or en.name() == title\
-               or en.name() == (title + '\0'):
-                res.append(en)
-        return res
+        return list(self.__lookup(title))
 
     def get(self, title, index=0):
         """Return data from a wrapper given its name and index"""
-        count = 0
-        for en in self.__entries:
-            if en.name() == title or en.name() == (title + '\0'):
-                if index == count: return en.read()
-                count = count + 1
-        raise Exception("Index {}/{} out of range "
-                        "for container {}".format(title,count, self.__name))
+        entries = self.__lookup(title)
+        if index < 0 or index >= len(entries):
+            raise Exception("Index {}/{} out of range "
+                            "for container {}"
+                            .format(title, len(entries), self.__name))
+        return entries[index].read()
 
     def getlist(self, title=""):
         """Return a list of data from wrappers matching the given title"""
-        res = []
-        for en in self.__entries:
-            if title == ""\
-               or en.name() == title\
-               or en.name() == (title + '\0'):
-                res.append(en.read())
-        return res
+        return [en.read() for en in self.__lookup(title)]
 
     def parent(self):
         """Return the parent of this parcel"""
@@ -191,7 +189,8 @@ class Entry(object):
                             .decode("ascii").strip('\0')
 
     def read(self):
-        """Read and returns data, formatted folowing the type"""
+        """Read and returns data, formatted folowing the type.
+        Data is decoded at first call and kept for following ones."""
         if not self.__readed:
             Stream = self.__stream
             Stream.seek(self.__start + 12, 0)
@@ -229,9 +228,9 @@ class Entry(object):
                 data = ReadEventsStartTime(Stream.read(self.__dsize))
             else:
                 data = Stream.read(self.__dsize)
-        else :
-            self._readed = True       
-        return data
+            self.__data = data
+            self.__readed = True
+        return self.__data
 
     def type(self): return self.__type
 
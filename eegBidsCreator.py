@@ -44,6 +44,7 @@ import tools.tools as tools
 import tools.plugins as plugins
 
 import tools.exceptions as Error
+from tools.resampler import Resampler
 
 # Generic classes import
 import DataStructure.Generic.Record as GenericRecord
@@ -196,7 +197,16 @@ def main(argv):
     recording = None
     try:
         if EmbRecord.IsValidInput(parameters['GENERAL']['Path']):
-                recording = EmbRecord()
+                recording = EmbRecord(memmap=parameters["EMBLA"]
+                                      .getboolean("MemoryMap"),
+                                      maxOpenFiles=parameters["EMBLA"]
+                                      .getint("MaxOpenFiles"),
+                                      headerCache=parameters["EMBLA"]
+                                      ["HeaderCache"],
+                                      threads=parameters["EMBLA"]
+                                      .getint("Threads"),
+                                      blockCache=parameters["EMBLA"]
+                                      .getint("BlockCache"))
         else:
             raise Error.UnknownFormatError("Unable determine eeg format")
 
@@ -362,13 +372,15 @@ def main(argv):
         if parameters.getboolean("EVENTS","IncludeSegmentStart"):
             if recording.GetMainChannel():
                 main_channel = recording.GetMainChannel()
+                segments = list()
                 for t in range(0, main_channel.GetNsequences()):
                     ev = GenericEvent.GenEvent(
                                   Name="New Segment", 
                                   Time=main_channel.GetSequenceStart(t), 
                                   Duration=main_channel.GetSequenceDuration(t))
                     ev.AddChannel(main_channel.GetId())
-                    recording.AddEvents(ev)
+                    segments.append(ev)
+                recording.AddEvents(segments)
             else:
                 Logger.warning(
                         "Main Channel is not defined."
@@ -377,6 +389,13 @@ def main(argv):
 
         plugins.RunPlugin("EventsEP", recording, argv_plugin, parameters["PLUGINS"])
 
+        # Resampling to common frequency
+        target_freq = None
+        if parameters["DATATREATMENT"]["TargetFrequency"] != "":
+            target_freq = int(parameters["DATATREATMENT"]["TargetFrequency"])
+            recording.Frequency = target_freq
+            Logger.info("Data will be resampled to {} Hz".format(target_freq))
+
         ################################
         # Creating meta-data json file #
         ################################
@@ -402,9 +421,10 @@ def main(argv):
         # and starting time        #
         ############################
 
-        for c in recording.Channels:
-            c.SetFrequencyMultiplyer(int(
-                recording.Frequency / c.GetFrequency()))
+        if target_freq is None:
+            for c in recording.Channels:
+                c.SetFrequencyMultiplyer(int(
+                    recording.Frequency / c.GetFrequency()))
 
         time_limits = None
         if recording.GetRun is not None \
@@ -446,7 +466,18 @@ def main(argv):
         file_list = list()
         mem_requested = float(parameters["GENERAL"]["MemoryUsage"])\
             * (1024 ** 3)
-        if parameters['GENERAL']['Conversion'] == "EDF":
+        if target_freq is not None:
+            # Channels are read at their own frequency,
+            # with the margin needed by resampler
+            support = {f: Resampler(f, target_freq).Support
+                       for f in set(ch.GetFrequency()
+                                    for ch in recording.Channels)}
+            mem_1s = 32 * sum(max(ch.GetFrequency(), target_freq)
+                              + support[ch.GetFrequency()]
+                              for ch in recording.Channels)
+        elif parameters['GENERAL']['Conversion'] == "EDF"\
+                or parameters.getboolean("DATATREATMENT", "SplitFrequencies"):
+            # Channels are written at their own frequency
             mem_1s = 32 * sum(ch.GetFrequency() for ch in recording.Channels)
         elif parameters['GENERAL']['Conversion'] == "BV": 
             mem_1s = 32 * len(recording.Channels) * recording.Frequency
@@ -475,99 +506,155 @@ def main(argv):
                                                           t_end - t_ref))
                 recording.SetRun(count + 1)
 
-            recording.DumpJSON()
-            Logger.info("Creating channels.tsv file")
-            with open(recording.Path(appdir="eeg",
-                                     appfile=recording.GetPrefix()
-                                     + "_channels.tsv"),
-                      "w", 
-                      encoding='utf-8') as f:
-                GenericChannel.GenChannel.BIDSfields.DumpDefinitions(
+            # Channels are written in groups, each group being stored
+            # in a separate file set: (acquisition suffix, frequency, channels)
+            groups = [(None, recording.Frequency, channels)]
+            if parameters.getboolean("DATATREATMENT", "SplitFrequencies")\
+                    and target_freq is None\
+                    and parameters['GENERAL']['Conversion'] in ["BV", "MEEG"]:
+                freqs = sorted(set(c.GetFrequency() for c in channels),
+                               reverse=True)
+                if len(freqs) > 1:
+                    groups = [("{}Hz".format(fr), fr, 
+                               [c for c in channels 
+                                if c.GetFrequency() == fr])
+                              for fr in freqs]
+                    Logger.info("Channels splitted in {} groups by frequency"
+                                .format(len(groups)))
+
+            for acq, freq, g_channels in groups:
+                if acq is None:
+                    recording.DumpJSON()
+                else:
+                    recording.DumpJSON(acq=acq, channels=g_channels)
+                Logger.info("Creating channels.tsv file")
+                with open(recording.Path(appdir="eeg",
+                                         appfile=recording.GetPrefix(acq=acq)
+                                         + "_channels.tsv"),
+                          "w", 
+                          encoding='utf-8') as f:
+                    GenericChannel.GenChannel.BIDSfields.DumpDefinitions(
+                            recording.Path(appdir="eeg")
+                            + recording.GetPrefix(acq=acq)
+                            + "_channels.json"
+                            )
+                    print(GenericChannel.GenChannel.BIDSfields.GetHeader(),
+                          file=f)
+                    for c in g_channels:
+                        c.BIDSvalues["name"] = c.GetName()
+                        c.BIDSvalues["type"] = c.GetType()
+                        c.BIDSvalues["units"] = c.GetUnit()
+                        c.BIDSvalues["description"] = c.GetDescription()
+                        c.BIDSvalues["sampling_frequency"] =\
+                            target_freq or c.GetFrequency()
+                        c.BIDSvalues["reference"] = c.GetReference()
+                        print(c.BIDSfields.GetLine(c.BIDSvalues), file=f)
+
+                Logger.info("Creating events.tsv file")     
+                GenericEvent.GenEvent.BIDSfields.DumpDefinitions(
                         recording.Path(appdir="eeg")
-                        + recording.GetPrefix()
-                        + "_channels.json"
-                        )
-                print(GenericChannel.GenChannel.BIDSfields.GetHeader(), file=f)
-                for c in channels:
-                    c.BIDSvalues["name"] = c.GetName()
-                    c.BIDSvalues["type"] = c.GetType()
-                    c.BIDSvalues["units"] = c.GetUnit()
-                    c.BIDSvalues["description"] = c.GetDescription()
-                    c.BIDSvalues["sampling_frequency"] = c.GetFrequency()
-                    c.BIDSvalues["reference"] = c.GetReference()
-                    print(c.BIDSfields.GetLine(c.BIDSvalues), file=f)
-
-            Logger.info("Creating events.tsv file")     
-            GenericEvent.GenEvent.BIDSfields.DumpDefinitions(
-                    recording.Path(appdir="eeg")
-                    + recording.GetPrefix(app="_events.json"))
-            with open(recording.Path(appdir="eeg")
-                      + recording.GetPrefix(app="_events.tsv"),
-                      "w", encoding='utf-8') as f:
-                print(GenericEvent.GenEvent.BIDSfields.GetHeader(), file=f)
-                for ev in events:
-                    ev.BIDSvalues["onset"] = ev.GetOffset(t_ref)
-                    ev.BIDSvalues["duration"] = ev.GetDuration()
-                    ev.BIDSvalues["trial_type"] = ev.GetName()
-                    if ev.GetChannelsSize() == 0\
-                       or parameters.getboolean("EVENTS","MergeCommonEvents"):
-                        ev.BIDSvalues["channels"] = ev.GetChannels()
-                        print(ev.BIDSfields.GetLine(ev.BIDSvalues), file=f)
-                    else :
-                        for c_id in ev.GetChannels():
-                            ev.BIDSvalues["channels"] = ev.GetChannelById(c_id)
-                            print(ev.BIDSfields.GetLine(ev.libValues), file=f)
+                        + recording.GetPrefix(app="_events.json", acq=acq))
+                with open(recording.Path(appdir="eeg")
+                          + recording.GetPrefix(app="_events.tsv", acq=acq),
+                          "w", encoding='utf-8') as f:
+                    print(GenericEvent.GenEvent.BIDSfields.GetHeader(), 
+                          file=f)
+                    for ev in events:
+                        ev.BIDSvalues["onset"] = ev.GetOffset(t_ref)
+                        ev.BIDSvalues["duration"] = ev.GetDuration()
+                        ev.BIDSvalues["trial_type"] = ev.GetName()
+                        if ev.GetChannelsSize() == 0\
+                           or parameters.getboolean("EVENTS",
+                                                    "MergeCommonEvents"):
+                            ev.BIDSvalues["channels"] = ev.GetChannels()
+                            print(ev.BIDSfields.GetLine(ev.BIDSvalues), 
+                                  file=f)
+                        else :
+                            for c_id in ev.GetChannels():
+                                ev.BIDSvalues["channels"] =\
+                                    ev.GetChannelById(c_id)
+                                print(ev.BIDSfields.GetLine(ev.libValues),
+                                      file=f)
 
             # BV format
             if parameters['GENERAL']['Conversion'] == "BV":
                 Logger.info("Converting to BrainVision format")
-                outData = BrainVision(recording.Path(appdir="eeg"),
-                                      recording.GetPrefix(),
-                                      AnonymDate=ANONYM_DATE)
-                outData.SetEncoding(parameters['BRAINVISION']['Encoding'])
-                outData.SetDataFormat(parameters['BRAINVISION']['DataFormat'])
-                outData.SetEndian(parameters['BRAINVISION']['Endian'] 
-                                  == "Little")
-                outData.AddFrequency(recording.Frequency)
-
-                Logger.info("Creating eeg.vhdr header file")
-                for ch in channels:
-                    outData.Header.Channels.append(
-                            BvChannel(Base=ch,
-                                      Comments=ch.SigMainType 
-                                      + "-" + ch.SigSubType))
-                outData.Header.write()
-
-                Logger.info("Creating eeg.vmrk markers file")
-                outData.MarkerFile.OpenFile(outData.GetEncoding())
-                outData.MarkerFile.SetFrequency(outData.GetFrequency())
-                outData.MarkerFile.SetStartTime(t_ref)
-                Logger.info("Writting proper events")
-                outData.MarkerFile.AddMarker("New Segment", t_ref, 0, -1, "")
-                for ev in events:
-                    if (ev.GetChannelsSize() == 0)\
-                       or parameters.getboolean("EVENTS","MergeCommonEvents"):
-                        outData.MarkerFile.AddMarker(
-                                ev.GetName(ToReplace=(",", "\1")),
-                                ev.GetTime(),
-                                ev.GetDuration(), -1, "")
-                    else:
-                        for c in ev.GetChannels():
-                            outData.MarkerFile.AddMarker(
-                                    ev.GetName(ToReplace=(",","\1")), 
-                                    ev.GetTime(), ev.GetDuration(), 
-                                    channels.index(
-                                        recording.GetChannelById(c)),
-                                    "")
-                outData.MarkerFile.Write()
-
-                Logger.info("Creating eeg data file")
-                outData.DataFile.SetDataFormat(
-                        outData.Header.BinaryInfo.BinaryFormat)
-                outData.DataFile.SetEndian(
-                        outData.Header.BinaryInfo.UseBigEndianOrder)
-                outData.DataFile.OpenFile()
-                t_e = t_ref
+                segments = [(t_ref, t_end)]
+                if parameters.getboolean("DATATREATMENT", "SkipGaps"):
+                    segments = recording.GetDataSegments(
+                            t_ref, t_end, timedelta(seconds=int(
+                                parameters["DATATREATMENT"]["MinGap"])))
+                    Logger.info("Data stored in {} segments"
+                                .format(len(segments)))
+
+                outData = list()
+                for acq, freq, g_channels in groups:
+                    bv = BrainVision(recording.Path(appdir="eeg"),
+                                     recording.GetPrefix(acq=acq),
+                                     AnonymDate=ANONYM_DATE)
+                    outData.append(bv)
+                    bv.SetEncoding(parameters['BRAINVISION']['Encoding'])
+                    bv.SetDataFormat(parameters['BRAINVISION']['DataFormat'])
+                    bv.SetEndian(parameters['BRAINVISION']['Endian'] 
+                                 == "Little")
+                    bv.AddFrequency(freq)
+                    bv.SetOrientation(
+                            parameters['BRAINVISION']['Orientation'])
+                    if bv.GetOrientation() == "VECTORIZED":
+                        # Number of points must be known before writing
+                        bv.Header.CommonInfo.DataPoints = sum(
+                            (s_e - s_s) // timedelta(microseconds=1)
+                            * bv.GetFrequency() // 1000000
+                            for s_s, s_e in segments)
+
+                    Logger.info("Creating eeg.vhdr header file")
+                    for ch in g_channels:
+                        bv.Header.Channels.append(
+                                BvChannel(Base=ch,
+                                          Comments=ch.SigMainType 
+                                          + "-" + ch.SigSubType))
+                    bv.Header.write()
+
+                    Logger.info("Creating eeg.vmrk markers file")
+                    bv.MarkerFile.OpenFile(bv.GetEncoding())
+                    bv.MarkerFile.SetFrequency(bv.GetFrequency())
+                    bv.MarkerFile.SetStartTime(t_ref)
+                    if parameters.getboolean("DATATREATMENT", "SkipGaps"):
+                        bv.MarkerFile.SetSegments(segments)
+                    Logger.info("Writting proper events")
+                    for s_s, s_e in segments:
+                        bv.MarkerFile.AddMarker("New Segment", s_s, 
+                                                0, -1, "")
+                    for ev in events:
+                        if (ev.GetChannelsSize() == 0)\
+                           or parameters.getboolean("EVENTS",
+                                                    "MergeCommonEvents"):
+                            bv.MarkerFile.AddMarker(
+                                    ev.GetName(ToReplace=(",", "\1")),
+                                    ev.GetTime(),
+                                    ev.GetDuration(), -1, "")
+                        else:
+                            for c in ev.GetChannels():
+                                # Channels from other groups are marked
+                                # as common events
+                                c = recording.GetChannelById(c)
+                                bv.MarkerFile.AddMarker(
+                                        ev.GetName(ToReplace=(",","\1")), 
+                                        ev.GetTime(), ev.GetDuration(), 
+                                        g_channels.index(c) 
+                                        if c in g_channels else -1,
+                                        "")
+                    bv.MarkerFile.Write()
+
+                    Logger.info("Creating eeg data file")
+                    bv.DataFile.SetDataFormat(
+                            bv.Header.BinaryInfo.BinaryFormat)
+                    bv.DataFile.SetEndian(
+                            bv.Header.BinaryInfo.UseBigEndianOrder)
+                    bv.DataFile.SetOrientation(
+                            bv.Header.CommonInfo.DataOrientation,
+                            bv.Header.CommonInfo.DataPoints)
+                    bv.DataFile.OpenFile(len(g_channels))
                 t_count = 1
 
                 mem_used = process.memory_info().rss
@@ -582,37 +669,46 @@ def main(argv):
                              .format(tools.humanbytes(mem_1s)))
                 Logger.debug("Time step:{}"
                              .format(timedelta(seconds=t_step)))
-                while True:
-                    t_s = t_e
-                    t_e = t_e + timedelta(0,t_step,0)
-                    if t_s >= t_end: break
-                    if t_e > t_end: 
-                        t_e = t_end
-                        t_step = (t_e - t_s).total_seconds()
-                    Logger.info("Timepoint {}: Duration {}"
-                                .format(t_count,t_e - t_s))
-                    Logger.debug("From {} to {} ({})sec."
-                                 .format(t_s.isoformat(),
-                                         t_e.isoformat(), 
-                                         (t_e - t_s).total_seconds()))
-                    l_data = []
-                    for ch in channels:
-                        l_data.append(ch.GetValueVector(
-                            t_s, t_e, 
-                            freq_mult=ch.GetFrequencyMultiplyer(),
-                            raw=True))
-
-                    plugins.RunPlugin("DataEP", recording,
-                              argv_plugin, parameters["PLUGINS"], 
-                              data=l_data)
-
-                    outData.DataFile.WriteBlock(l_data)
-                    t_count += 1
+                # Segments are concatenated, gaps are not written
+                for s_s, s_e in segments:
+                    t_e = s_s
+                    while True:
+                        t_s = t_e
+                        t_e = t_e + timedelta(0,t_step,0)
+                        if t_s >= s_e: break
+                        if t_e > s_e: 
+                            t_e = s_e
+                        Logger.info("Timepoint {}: Duration {}"
+                                    .format(t_count,t_e - t_s))
+                        Logger.debug("From {} to {} ({})sec."
+                                     .format(t_s.isoformat(),
+                                             t_e.isoformat(), 
+                                             (t_e - t_s).total_seconds()))
+                        for (acq, freq, g_channels), bv in zip(groups, 
+                                                               outData):
+                            l_data = []
+                            for ch in g_channels:
+                                if target_freq is not None:
+                                    l_data.append(ch.GetResampledBlock(
+                                        t_s, t_e, target_freq, raw=True))
+                                    continue
+                                l_data.append(ch.GetBlock(
+                                    t_s, t_e, 
+                                    freq_mult=freq // ch.GetFrequency(),
+                                    raw=True))
+
+                            plugins.RunPlugin("DataEP", recording,
+                                      argv_plugin, parameters["PLUGINS"], 
+                                      data=l_data)
+
+                            bv.DataFile.WriteBlock(l_data)
+                        t_count += 1
+                for acq, freq, g_channels in groups:
                     recording.BIDSvalues["filename"] = "eeg/{}".format(
-                        recording.GetPrefix(app="_eeg.vhdr"))
+                        recording.GetPrefix(app="_eeg.vhdr", acq=acq))
                     recording.BIDSvalues["acq_time"] = t_ref
-                file_list.append(recording.BIDSfields
-                                 .GetLine(recording.BIDSvalues))
+                    file_list.append(recording.BIDSfields
+                                     .GetLine(recording.BIDSvalues))
 
             # EDF part
             elif parameters['GENERAL']['Conversion'] == "EDF":
@@ -647,6 +743,22 @@ def main(argv):
                 outData.SetStartTime(t_ref)
                 outData.RecordDuration =\
                     int(parameters["EDF"]["DataRecordDuration"])
+                segments = [(t_ref, t_end)]
+                if parameters.getboolean("DATATREATMENT", "SkipGaps"):
+                    if parameters.getboolean('EDF', 'EDFplus'):
+                        # Gaps shorter than a record are kept,
+                        # so records never overlap
+                        segments = recording.GetDataSegments(
+                                t_ref, t_end, timedelta(seconds=max(
+                                    int(parameters["DATATREATMENT"]
+                                        ["MinGap"]),
+                                    outData.RecordDuration)))
+                        Logger.info("Data stored in {} segments"
+                                    .format(len(segments)))
+                    else:
+                        Logger.warning("Gaps can be skipped only "
+                                       "in EDF+ format")
+                outData.SetContinuous(len(segments) == 1)
 
                 Logger.info("Creating events.edf file")
                 for ev in events:
@@ -675,8 +787,9 @@ def main(argv):
                                        Specs=ch.SigMainType
                                        + "-" + ch.SigSubType,
                                        Filter=""))
+                    if target_freq is not None:
+                        outData.Channels[-1].SetFrequency(target_freq)
                 outData.WriteHeader()
-                t_e = t_ref
 
                 mem_used = process.memory_info().rss
                 mem_remained = mem_requested - mem_used
@@ -692,48 +805,45 @@ def main(argv):
                     t_step = outData.RecordDuration \
                              * (t_step // outData.RecordDuration + 1)
                 t_count = 1
-                while True:
-                    t_s = t_e
-                    t_e = t_e + timedelta(0, t_step, 0)
-                    if t_s >= t_end: break
-                    if t_e > t_end: 
-                        t_e = t_end
-                        t_step = (t_e - t_s).total_seconds()
-                        if t_step % outData.RecordDuration != 0:
-                            t_step = outData.RecordDuration \
-                                * (t_step // outData.RecordDuration + 1)
-                            t_e = t_s + timedelta(0,t_step,0)
-
-                    Logger.info("Timepoint {}: Duration {}"
-                                .format(t_count,t_e - t_s))
-                    Logger.debug("From {} to {} ({})sec."
-                                 .format(t_s.isoformat(),
-                                         t_e.isoformat(), 
-                                         (t_e - t_s).total_seconds()))
-                    l_data = []
-                    for ch in channels:
-                        l_data.append(
-                                ch.GetValueVector(t_s, t_e, 
-                                                  freq_mult=1, raw=True))
-
-                    if entry_points[4] in plugins:
-                        try:
-                            result = 0
-                            result = plugins[entry_points[4]](
-                                        channels, 
-                                        l_data, 
-                                        argv_plugin, 
-                                        parameters["PLUGINS"])
-                            if result != 0:
-                                raise Exception(
-                                        "Plugin {} returned code {}"
-                                        .format(entry_points[4], result))
-                        except Exception:
-                            ex_code = 100 + 40 + result
-                            raise
-
-                    outData.WriteDataBlock(l_data, t_s)
-                    t_count += 1
+                for s_s, s_e in segments:
+                    t_e = s_s
+                    while True:
+                        t_s = t_e
+                        t_e = t_e + timedelta(0, t_step, 0)
+                        if t_s >= s_e: break
+                        if t_e > s_e: 
+                            # Last record is completed by default values
+                            step = (s_e - t_s).total_seconds()
+                            if step % outData.RecordDuration != 0:
+                                step = outData.RecordDuration \
+                                    * (step // outData.RecordDuration + 1)
+                            t_e = t_s + timedelta(0, step, 0)
+
+                        Logger.info("Timepoint {}: Duration {}"
+                                    .format(t_count,t_e - t_s))
+                        Logger.debug("From {} to {} ({})sec."
+                                     .format(t_s.isoformat(),
+                                             t_e.isoformat(), 
+                                             (t_e - t_s).total_seconds()))
+                        l_data = []
+                        # Raw samples are copied without decoding
+                        # if stored as EDF type
+                        for ch in channels:
+                            if target_freq is not None:
+                                l_data.append(ch.GetResampledBlock(
+                                    t_s, t_e, target_freq, 
+                                    raw=True, dtype=EDF.DTYPE))
+                                continue
+                            l_data.append(
+                                    ch.GetBlock(t_s, t_e, freq_mult=1, 
+                                                raw=True, dtype=EDF.DTYPE))
+
+                        plugins.RunPlugin("DataEP", recording,
+                                          argv_plugin, parameters["PLUGINS"], 
+                                          data=l_data)
+
+                        outData.WriteDataBlock(l_data, t_s)
+                        t_count += 1
                 outData.Close()
 
                 recording.BIDSvalues["filename"] = "eeg/{}".format(
@@ -745,21 +855,25 @@ def main(argv):
             # Matlab SPM12 eeg format
             elif parameters['GENERAL']["Conversion"] == "MEEG":
                 Logger.info("Converting to Matlab SPM format")
-                outData = MEEG(recording.Path(appdir="eeg"),
-                               recording.GetPrefix(),
-                               AnonymDate=ANONYM_DATE)
-                outData.SetStartTime(t_ref)
-                outData.SetDuration((t_end - t_ref).total_seconds())
-                outData.AddFrequency(recording.Frequency)
-                Logger.info("Creating eeg.mat header file")
-                outData.InitHeader()
-                for ch in channels:
-                    outData.AppendChannel(ch)
-                outData.WriteChannels()
-                for ev in events:
-                    outData.AppendEvent(ev)
-                outData.WriteEvents()
-                outData.WriteHeader()
+                outData = list()
+                for acq, freq, g_channels in groups:
+                    meeg = MEEG(recording.Path(appdir="eeg"),
+                                recording.GetPrefix(acq=acq),
+                                AnonymDate=ANONYM_DATE)
+                    outData.append(meeg)
+                    meeg.SetStartTime(t_ref)
+                    meeg.SetDuration((t_end - t_ref).total_seconds())
+                    meeg.AddFrequency(freq)
+                    meeg.SetDataFormat(parameters['MEEG']['DataFormat'])
+                    Logger.info("Creating eeg.mat header file")
+                    meeg.InitHeader()
+                    for ch in g_channels:
+                        meeg.AppendChannel(ch)
+                    meeg.WriteChannels()
+                    for ev in events:
+                        meeg.AppendEvent(ev)
+                    meeg.WriteEvents()
+                    meeg.WriteHeader()
 
                 Logger.info("Creating eeg.dat file")
                 t_e = t_ref
@@ -789,17 +903,24 @@ def main(argv):
                                  .format(t_s.isoformat(), 
                                          t_e.isoformat(), 
                                          (t_e - t_s).total_seconds()))
-                    l_data = []
-                    for ch in channels:
-                        l_data.append(ch.GetValueVector(
-                            t_s, t_e, freq_mult=ch.GetFrequencyMultiplyer()))
-                    outData.WriteBlock(l_data)
+                    for (acq, freq, g_channels), meeg in zip(groups, outData):
+                        l_data = []
+                        for ch in g_channels:
+                            if target_freq is not None:
+                                l_data.append(ch.GetResampledBlock(
+                                    t_s, t_e, target_freq))
+                                continue
+                            l_data.append(ch.GetBlock(
+                                t_s, t_e, freq_mult=freq // ch.GetFrequency()))
+                        meeg.WriteBlock(l_data)
                     t_count += 1
-                recording.BIDSvalues["filename"] = "eeg/{}".format(
-                    recording.GetPrefix(app="_eeg.mat"))
-                recording.BIDSvalues["acq_time"] = t_ref
-                file_list.append(recording.BIDSfields
-                                 .GetLine(recording.BIDSvalues))
+                for (acq, freq, g_channels), meeg in zip(groups, outData):
+                    meeg.Close()
+                    recording.BIDSvalues["filename"] = "eeg/{}".format(
+                        recording.GetPrefix(app="_eeg.mat", acq=acq))
+                    recording.BIDSvalues["acq_time"] = t_ref
+                    file_list.append(recording.BIDSfields
+                                     .GetLine(recording.BIDSvalues))
 
             # Copiyng original files if there no conversion
             elif parameters['GENERAL']["Conversion"] == "":
@@ -0,0 +1,143 @@
+#############################################################################
+## blockcache defines a cache of data blocks shared between channels
+#############################################################################
+## Copyright (c) 2018-2019, University of Liège
+## Author: Nikita Beliy
+## Owner: Liege University https://www.uliege.be
+## Version: 0.77r5
+## Maintainer: Nikita Beliy
+## Email: Nikita.Beliy@uliege.be
+## Status: developpement
+#############################################################################
+## This file is part of eegBidsCreator
+## eegBidsCreator is free software: you can redistribute it and/or modify
+## it under the terms of the GNU General Public License as published by
+## the Free Software Foundation, either version 2 of the License, or
+## (at your option) any later version.
+## eegBidsCreator is distributed in the hope that it will be useful,
+## but WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+## GNU General Public License for more details.
+## You should have received a copy of the GNU General Public License
+## along with eegBidsCreator.  If not, see <https://www.gnu.org/licenses/>.
+############################################################################
+
+import threading
+from collections import OrderedDict
+
+
+class BlockCache(object):
+    """
+    Cache of decoded data blocks, with a global memory budget.
+    Least recently used blocks are evicted when budget is exceeded.
+
+    Blocks are identified by a (stream, index) key, where stream
+    identifies a continuous data (e.g. a sequence of a channel).
+    The cache keeps the last accessed block of each stream, in order
+    to detect a sequential reading and to allow read-ahead.
+    """
+    __slots__ = ["_budget", "_used", "_blocks", "_last", "_lock",
+                 "BlockSize"]
+
+    def __init__(self, budget, blockSize=32768):
+        """
+        Parameters
+        ----------
+        budget : int
+            maximum memory (in bytes) used by cached blocks
+        blockSize : int
+            number of data points in a block
+        """
+        self._budget = budget
+        self._used = 0
+        self._blocks = OrderedDict()
+        self._last = dict()
+        self._lock = threading.Lock()
+        self.BlockSize = blockSize
+
+    def __len__(self):
+        return len(self._blocks)
+
+    def GetUsed(self):
+        """Returns the memory (in bytes) used by cached blocks"""
+        return self._used
+
+    def Get(self, stream, index):
+        """
+        Retrieves a block from cache
+
+        Parameters
+        ----------
+        stream : hashable
+            identifier of data stream
+        index : int
+            index of block in stream
+
+        Returns
+        -------
+        numpy.ndarray or None
+            cached block, None if block is not in cache
+        """
+        key = (stream, index)
+        with self._lock:
+            block = self._blocks.get(key)
+            if block is not None:
+                self._blocks.move_to_end(key)
+            return block
+
+    def Put(self, stream, index, block):
+        """
+        Stores a block in cache, evicting least recently used
+        blocks if needed. Blocks bigger than budget are not stored.
+
+        Parameters
+        ----------
+        stream : hashable
+            identifier of data stream
+        index : int
+            index of block in stream
+        block : numpy.ndarray
+            data block
+        """
+        if block.nbytes > self._budget:
+            return
+        key = (stream, index)
+        with self._lock:
+            old = self._blocks.pop(key, None)
+            if old is not None:
+                self._used -= old.nbytes
+            while self._used + block.nbytes > self._budget:
+                self._used -= self._blocks.popitem(last=False)[1].nbytes
+            self._blocks[key] = block
+            self._used += block.nbytes
+
+    def IsSequential(self, stream, first, last):
+        """
+        Registers access to blocks [first, last] of stream, and checks
+        if it continues the previous access to the same stream
+
+        Parameters
+        ----------
+        stream : hashable
+            identifier of data stream
+        first : int
+            index of first accessed block
+        last : int
+            index of last accessed block
+
+        Returns
+        -------
+        bool
+            True if access is sequential
+        """
+        with self._lock:
+            prev = self._last.get(stream)
+            self._last[stream] = last
+        return prev is not None and prev <= first <= prev + 1
+
+    def Clear(self):
+        """Removes all blocks from cache"""
+        with self._lock:
+            self._blocks.clear()
+            self._last.clear()
+            self._used = 0
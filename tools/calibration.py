@@ -0,0 +1,131 @@
+#############################################################################
+## calibration compiles calibration functions into vectorized expressions
+#############################################################################
+## Copyright (c) 2018-2019, University of Liège
+## Author: Nikita Beliy
+## Owner: Liege University https://www.uliege.be
+## Version: 0.77r5
+## Maintainer: Nikita Beliy
+## Email: Nikita.Beliy@uliege.be
+## Status: developpement
+#############################################################################
+## This file is part of eegBidsCreator
+## eegBidsCreator is free software: you can redistribute it and/or modify
+## it under the terms of the GNU General Public License as published by
+## the Free Software Foundation, either version 2 of the License, or
+## (at your option) any later version.
+## eegBidsCreator is distributed in the hope that it will be useful,
+## but WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+## GNU General Public License for more details.
+## You should have received a copy of the GNU General Public License
+## along with eegBidsCreator.  If not, see <https://www.gnu.org/licenses/>.
+############################################################################
+
+import ast
+import operator
+
+import numpy
+
+
+"""Operators allowed in expressions"""
+_BinaryOperators = {
+        ast.Add: operator.add,
+        ast.Sub: operator.sub,
+        ast.Mult: operator.mul,
+        ast.Div: operator.truediv,
+        ast.Pow: numpy.power,
+        }
+
+_UnaryOperators = {
+        ast.UAdd: operator.pos,
+        ast.USub: operator.neg,
+        }
+
+"""Functions allowed in expressions"""
+_Functions = {
+        "abs": numpy.abs,
+        "sqrt": numpy.sqrt,
+        "exp": numpy.exp,
+        "log": numpy.log,
+        "log10": numpy.log10,
+        "sin": numpy.sin,
+        "cos": numpy.cos,
+        "tan": numpy.tan,
+        "atan": numpy.arctan,
+        "pow": numpy.power,
+        }
+
+"""Named constants allowed in expressions"""
+_Constants = {
+        "pi": numpy.pi,
+        "e": numpy.e,
+        }
+
+
+def CompileExpression(expression, variable="x"):
+    """
+    Compiles an arithmetic expression of one variable into a function
+    applicable to numpy arrays. Only numbers, the variable, named
+    constants, arithmetic operators and a set of mathematical
+    functions are accepted, the expression is never passed to eval.
+
+    Parameters
+    ----------
+    expression : str
+        expression to compile, for example '0.5*x**2+3'
+    variable : str
+        name of variable in expression
+
+    Returns
+    -------
+    callable
+        function of one argument (scalar or numpy.ndarray)
+
+    Raises
+    ------
+    ValueError
+        if expression is invalid or contains forbidden elements
+    """
+    try:
+        tree = ast.parse(expression.strip(), mode="eval")
+    except SyntaxError as e:
+        raise ValueError("Invalid expression '{}': {}"
+                         .format(expression, e.msg))
+    return _compileNode(tree.body, variable)
+
+
+def _compileNode(node, variable):
+    """
+    Recursively builds the function computing the value of node
+    """
+    if isinstance(node, ast.BinOp) and type(node.op) in _BinaryOperators:
+        op = _BinaryOperators[type(node.op)]
+        left = _compileNode(node.left, variable)
+        right = _compileNode(node.right, variable)
+        return lambda x: op(left(x), right(x))
+    if isinstance(node, ast.UnaryOp) and type(node.op) in _UnaryOperators:
+        op = _UnaryOperators[type(node.op)]
+        operand = _compileNode(node.operand, variable)
+        return lambda x: op(operand(x))
+    if isinstance(node, ast.Name):
+        if node.id == variable:
+            return lambda x: x
+        if node.id in _Constants:
+            value = _Constants[node.id]
+            return lambda x: value
+        raise ValueError("Unknown name '{}'".format(node.id))
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Name)\
+            and node.func.id in _Functions and not node.keywords:
+        func = _Functions[node.func.id]
+        args = [_compileNode(a, variable) for a in node.args]
+        return lambda x: func(*[a(x) for a in args])
+    # Numbers are ast.Num before python 3.8
+    numbers = (getattr(ast, "Constant", ()), getattr(ast, "Num", ()))
+    value = getattr(node, "value", getattr(node, "n", None))
+    if isinstance(node, numbers) and isinstance(value, (int, float))\
+            and not isinstance(value, bool):
+        value = float(value)
+        return lambda x: value
+    raise ValueError("Forbidden element '{}' in expression"
+                     .format(type(node).__name__))
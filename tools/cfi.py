@@ -75,6 +75,9 @@ def default_parameters():
     parameters['DATATREATMENT'] = {
                             "StartTime"     :"", "EndTime"  :"", 
                             "StartEvent"    :"", "EndEvent" :"",
+                            "SkipGaps"      :"no", "MinGap" :"1",
+                            "SplitFrequencies"  :"no",
+                            "TargetFrequency"   :""
                                   }
     parameters['RUNS'] = {
                             "SplitRuns"     :"",
@@ -98,13 +101,23 @@ def default_parameters():
     parameters['BRAINVISION'] = {
                                     "Encoding"  :"UTF-8", 
                                     "DataFormat":"IEEE_FLOAT_32", 
-                                    "Endian"    :"Little"
+                                    "Endian"    :"Little",
+                                    "Orientation":"MULTIPLEXED"
                                 }
     parameters['EDF'] = {
                         "DataRecordDuration"    :"10",
                         "EDFplus"               :"yes"
                         }
-    parameters['MEEG'] = {}
+    parameters['MEEG'] = {
+                        "DataFormat"    :"float32"
+                        }
+    parameters['EMBLA'] = {
+                        "MemoryMap"     :"yes",
+                        "MaxOpenFiles"  :"64",
+                        "HeaderCache"   :"",
+                        "Threads"       :"4",
+                        "BlockCache"    :"64"
+                        }
     return parameters
 
 
@@ -173,6 +186,11 @@ def check_configuration(parameters):
     passed = check_time(parameters, sec, "EndTime", chop=6) and passed
     passed = check_string(parameters, sec, "StartEvent") and passed
     passed = check_string(parameters, sec, "EndEvent") and passed
+    passed = check_bool(parameters, sec, "SkipGaps") and passed
+    passed = check_int(parameters, sec, "MinGap", False) and passed
+    passed = check_bool(parameters, sec, "SplitFrequencies") and passed
+    passed = check_int(parameters, sec, "TargetFrequency", minimum=1)\
+        and passed
 
     # RUNS
     sec = "RUNS"
@@ -207,6 +225,9 @@ def check_configuration(parameters):
         and passed
     passed = check_string(parameters, sec, "Endian", empty=False) \
         and passed
+    passed = check_string(parameters, sec, "Orientation", 
+                          ["MULTIPLEXED", "VECTORIZED"], empty=False) \
+        and passed
 
     # EDF
     sec = "EDF"
@@ -214,6 +235,20 @@ def check_configuration(parameters):
         and passed
     passed = check_bool(parameters, sec, "EDFplus") and passed
 
+    # MEEG
+    sec = "MEEG"
+    passed = check_string(parameters, sec, "DataFormat", 
+                          ["float32", "int16"], empty=False) \
+        and passed
+
+    # EMBLA
+    sec = "EMBLA"
+    passed = check_bool(parameters, sec, "MemoryMap") and passed
+    passed = check_int(parameters, sec, "MaxOpenFiles", False) and passed
+    passed = check_string(parameters, sec, "HeaderCache") and passed
+    passed = check_int(parameters, sec, "Threads", False) and passed
+    passed = check_int(parameters, sec, "BlockCache", False) and passed
+
     if not passed: 
         return False
 
@@ -289,7 +324,7 @@ def check_bool(parameters, section, name, empty=True):
     return True
 
 
-def check_int(parameters, section, name, empty=True):
+def check_int(parameters, section, name, empty=True, minimum=None):
     val = parameters.get(section, name, fallback=None)
     if val is None:
         print(section + ": " + name + " not found")
@@ -301,10 +336,14 @@ def check_int(parameters, section, name, empty=True):
             print(section + ": Invalid " + name + "value : empty string")
             return False
     try:
-        parameters[section].getint(name)
+        value = parameters[section].getint(name)
     except ValueError:
         print(section + ": Invalid " + name + " value " + val)
         return False
+    if minimum is not None and value < minimum:
+        print(section + ": Invalid " + name + " value " + val
+              + ", must be at least " + str(minimum))
+        return False
     return True
 
 
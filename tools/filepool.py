@@ -0,0 +1,118 @@
+#############################################################################
+## filepool defines a pool of opened files shared between channels
+#############################################################################
+## Copyright (c) 2018-2019, University of Liège
+## Author: Nikita Beliy
+## Owner: Liege University https://www.uliege.be
+## Version: 0.77r5
+## Maintainer: Nikita Beliy
+## Email: Nikita.Beliy@uliege.be
+## Status: developpement
+#############################################################################
+## This file is part of eegBidsCreator
+## eegBidsCreator is free software: you can redistribute it and/or modify
+## it under the terms of the GNU General Public License as published by
+## the Free Software Foundation, either version 2 of the License, or
+## (at your option) any later version.
+## eegBidsCreator is distributed in the hope that it will be useful,
+## but WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+## GNU General Public License for more details.
+## You should have received a copy of the GNU General Public License
+## along with eegBidsCreator.  If not, see <https://www.gnu.org/licenses/>.
+############################################################################
+
+import logging
+import threading
+from collections import OrderedDict
+
+Logger = logging.getLogger(__name__)
+
+
+class FilePool(object):
+    """
+    Pool of files opened for reading in binary mode.
+    At most maxOpen files are kept opened simultaneously,
+    the least recently used file is closed when limit is reached,
+    and reopened transparently at next access.
+    """
+    __slots__ = ["_maxOpen", "_handles", "_lock"]
+
+    def __init__(self, maxOpen=64):
+        """
+        Parameters
+        ----------
+        maxOpen : int
+            maximum number of simultaneously opened files,
+            if 0 or negative, the number is unlimited
+
+        """
+        self._maxOpen = maxOpen
+        self._handles = OrderedDict()
+        self._lock = threading.RLock()
+
+    def __del__(self):
+        self.CloseAll()
+
+    def __len__(self):
+        return len(self._handles)
+
+    def _acquire(self, path):
+        """
+        Retrieves opened handle for given path, opening it if needed.
+        Must be called with lock acquired.
+        """
+        handle = self._handles.get(path)
+        if handle is not None:
+            self._handles.move_to_end(path)
+            return handle
+        if self._maxOpen > 0:
+            while len(self._handles) >= self._maxOpen:
+                old_path, old = self._handles.popitem(last=False)
+                Logger.debug("Closing {}".format(old_path))
+                old.close()
+        handle = open(path, "rb")
+        self._handles[path] = handle
+        return handle
+
+    def Read(self, path, pos, size):
+        """
+        Reads size bytes from file, starting at pos.
+
+        Parameters
+        ----------
+        path : str
+            path to file
+        pos : int
+            position of first byte to read
+        size : int
+            number of bytes to read, if negative reads until
+            end of file
+
+        Returns
+        -------
+        bytes
+            readed data, can be shorter than size if end of file
+            is reached
+        """
+        with self._lock:
+            handle = self._acquire(path)
+            handle.seek(pos)
+            return handle.read(size)
+
+    def Close(self, path):
+        """
+        Closes file with given path, if opened
+        """
+        with self._lock:
+            handle = self._handles.pop(path, None)
+            if handle is not None:
+                handle.close()
+
+    def CloseAll(self):
+        """
+        Closes all opened files
+        """
+        with self._lock:
+            while len(self._handles) > 0:
+                self._handles.popitem(last=False)[1].close()
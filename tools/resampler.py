@@ -0,0 +1,136 @@
+#############################################################################
+## resampler defines a polyphase resampler with anti-aliasing filter
+#############################################################################
+## Copyright (c) 2018-2019, University of Liège
+## Author: Nikita Beliy
+## Owner: Liege University https://www.uliege.be
+## Version: 0.77r5
+## Maintainer: Nikita Beliy
+## Email: Nikita.Beliy@uliege.be
+## Status: developpement
+#############################################################################
+## This file is part of eegBidsCreator
+## eegBidsCreator is free software: you can redistribute it and/or modify
+## it under the terms of the GNU General Public License as published by
+## the Free Software Foundation, either version 2 of the License, or
+## (at your option) any later version.
+## eegBidsCreator is distributed in the hope that it will be useful,
+## but WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+## GNU General Public License for more details.
+## You should have received a copy of the GNU General Public License
+## along with eegBidsCreator.  If not, see <https://www.gnu.org/licenses/>.
+############################################################################
+
+import math
+
+import numpy
+
+
+class Resampler(object):
+    """
+    Polyphase resampler from an input frequency to an output one.
+    The ratio of frequencies can be arbitrary (e.g. to correct
+    a clock drift), the output points are interpolated using a bank
+    of windowed-sinc filters, each corresponding to a fraction of
+    input sampling interval.
+
+    The filter cutoff is placed at the lowest of two Nyquist
+    frequencies, so downsampling is anti-aliased. Each filter is
+    normalized to unit gain, preserving constant signals.
+    """
+    __slots__ = ["InFrequency", "OutFrequency", "Support",
+                 "_phases", "_bank"]
+
+    # Number of data points processed at once by Interpolate
+    _BLOCK = 65536
+
+    def __init__(self, inFrequency, outFrequency,
+                 halfWidth=10, phases=256, beta=5.):
+        """
+        Parameters
+        ----------
+        inFrequency : float
+            input sampling frequency
+        outFrequency : float
+            output sampling frequency
+        halfWidth : int
+            number of zero-crossings of sinc on each side of filter
+        phases : int
+            number of filters in the bank, i.e. resolution of
+            interpolation as fraction of input interval
+        beta : float
+            shape parameter of Kaiser window
+        """
+        if inFrequency <= 0 or outFrequency <= 0:
+            raise ValueError("Frequencies must be positive")
+        self.InFrequency = inFrequency
+        self.OutFrequency = outFrequency
+        cutoff = min(1., outFrequency / inFrequency)
+        half = halfWidth * int(math.ceil(1. / cutoff))
+        # Number of input points contributing to an output point
+        self.Support = 2 * half
+        self._phases = phases
+
+        # offset[p, t] is the distance between the interpolated
+        # position with fraction p/phases and the input point t
+        offset = (numpy.arange(phases)[:, None] / phases
+                  + (half - 1) - numpy.arange(self.Support)[None, :])
+        window = numpy.zeros_like(offset)
+        inside = numpy.abs(offset) < half
+        window[inside] = numpy.i0(
+                beta * numpy.sqrt(1. - (offset[inside] / half) ** 2))
+        bank = cutoff * numpy.sinc(cutoff * offset) * window
+        self._bank = bank / bank.sum(axis=1)[:, None]
+
+    def GetRatio(self):
+        """Returns the number of input points per output point"""
+        return self.InFrequency / self.OutFrequency
+
+    def GetMargin(self):
+        """
+        Returns the number of input points needed before and after
+        the interpolated positions
+        """
+        return self.Support // 2
+
+    def Interpolate(self, data, first, positions):
+        """
+        Computes the filtered values at given positions
+
+        Parameters
+        ----------
+        data : numpy.ndarray
+            input points, data[0] being input point of index first
+        first : int
+            index of first point in data
+        positions : numpy.ndarray
+            positions (as fractional input indices) of output points,
+            positions outside data are computed by repeating the
+            first or last point
+
+        Returns
+        -------
+        numpy.ndarray(float64)
+            interpolated values
+        """
+        data = numpy.asarray(data, dtype=numpy.float64)
+        positions = numpy.asarray(positions, dtype=numpy.float64)
+        res = numpy.empty(len(positions), dtype=numpy.float64)
+        if len(data) == 0:
+            res.fill(0.)
+            return res
+        taps = numpy.arange(self.Support) - (self.Support // 2 - 1) - first
+        for s in range(0, len(positions), self._BLOCK):
+            pos = positions[s:s + self._BLOCK]
+            index = numpy.floor(pos)
+            phase = numpy.rint((pos - index) * self._phases).astype(int)
+            # Fraction rounded to next point
+            index += phase == self._phases
+            phase %= self._phases
+            index = numpy.clip(index.astype(int)[:, None] + taps[None, :],
+                               0, len(data) - 1)
+            res[s:s + self._BLOCK] = numpy.einsum("ij,ij->i",
+                                                  data[index],
+                                                  self._bank[phase])
+        return res